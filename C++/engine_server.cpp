@@ -0,0 +1,148 @@
+#include "engine_server.h"
+#include "fhe_process.h"
+#include "fhe_utils.h"
+#include "key_cache.h"
+
+#include <seal/seal.h>
+#include <chrono>
+#include <iostream>
+#include <map>
+#include <memory>
+#include <string>
+#include <unordered_set>
+#include <vector>
+#include <nlohmann/json.hpp>
+
+using json = nlohmann::json;
+using namespace seal;
+using namespace std;
+
+// poly_degree 별로 한 번만 만드는 컨텍스트/Evaluator
+struct EngineContext {
+    SEALContext context;
+    Evaluator evaluator;
+
+    explicit EngineContext(size_t poly_degree)
+        : context(make_bfv_context(poly_degree)), evaluator(context) {}
+};
+
+// 요청의 "compression" ("none" / "zlib" / "zstd") -> SEAL 압축 모드. 이 빌드의 SEAL 이 지원하지 않으면 none
+static compr_mode_type parse_compr_mode(const json &request) {
+    if (!request.contains("compression")) return Serialization::compr_mode_default;
+
+    // 압축 라이브러리 없이 빌드된 SEAL 에는 해당 enum 값 자체가 없음
+    string name = request.at("compression").get<string>();
+#ifdef SEAL_USE_ZLIB
+    if (name == "zlib") return compr_mode_type::zlib;
+#endif
+#ifdef SEAL_USE_ZSTD
+    if (name == "zstd") return compr_mode_type::zstd;
+#endif
+    return compr_mode_type::none;
+}
+
+static string compr_mode_name(compr_mode_type mode) {
+#ifdef SEAL_USE_ZLIB
+    if (mode == compr_mode_type::zlib) return "zlib";
+#endif
+#ifdef SEAL_USE_ZSTD
+    if (mode == compr_mode_type::zstd) return "zstd";
+#endif
+    return "none";
+}
+
+static void send_done(double elapsed, const string &error = "", size_t vectors = 0,
+                      compr_mode_type compr_mode = compr_mode_type::none) {
+    json done;
+    done["status"] = "done";
+    done["elapsed"] = elapsed;
+    done["vectors"] = vectors;
+    // 실제로 적용한 결과 압축 방식
+    done["compression"] = compr_mode_name(compr_mode);
+    if (!error.empty()) done["error"] = error;
+    cout << done.dump() << endl;
+}
+
+int run_server(size_t key_cache_bytes) {
+    KeyCache key_cache(key_cache_bytes);
+    map<size_t, unique_ptr<EngineContext>> contexts;
+
+    string line;
+    while (getline(cin, line)) {
+        if (line.empty()) continue;
+
+        json request;
+        try {
+            request = json::parse(line);
+        } catch (const exception &e) {
+            cerr << "Invalid request: " << e.what() << endl;
+            send_done(0, "Invalid request");
+            continue;
+        }
+
+        string cmd = request.value("cmd", "search");
+
+        if (cmd == "invalidate") {
+            key_cache.invalidate(request.value("keys_path", ""));
+            continue;
+        }
+
+        if (cmd != "search") {
+            send_done(0, "Unknown command: " + cmd);
+            continue;
+        }
+
+        auto start_time = chrono::high_resolution_clock::now();
+        try {
+            // "queries": [경로, ...] 면 인덱스 벡터를 한 번만 읽어서 여러 쿼리를 같이 평가
+            vector<string> query_paths;
+            if (request.contains("queries")) {
+                query_paths = request.at("queries").get<vector<string>>();
+            } else {
+                query_paths.push_back(request.at("query").get<string>());
+            }
+            string vector_folder = request.at("vector_folder").get<string>();
+            string keys_path = request.at("keys_path").get<string>();
+            size_t poly_degree = request.value("poly_degree", (size_t)8192);
+            ScanOptions options;
+            options.binary_output = request.value("output", string("json")) == "binary";
+            // 연산 스레드 수 (0 이면 CPU 코어 수)
+            options.threads = request.value("threads", (size_t)1);
+            options.compr_mode = parse_compr_mode(request);
+            // 사전별 설정: 결과를 마지막 레벨로 mod switch
+            options.mod_switch = request.value("mod_switch", false);
+            // 문서 점수를 슬롯별로 묶어서 출력 (결과 암호문 수 = 문서 수 / slot_count)
+            options.packed = request.value("packed", false);
+            if (options.packed && poly_degree < 8192) {
+                // BFVDefault(4096) 는 슬롯 마스크 곱셈 후 노이즈 여유가 남지 않아 복호화할 수 없음
+                send_done(0, "packed results need poly_degree >= 8192");
+                continue;
+            }
+            // "index_ids": [..] 가 있으면 폴더 전체 대신 해당 인덱스 벡터만 연산 (새로 업로드된 문서 평가용)
+            if (request.contains("index_ids")) {
+                for (const auto &index_id : request.at("index_ids")) options.only_ids.insert(index_id.get<int64_t>());
+                if (options.only_ids.empty()) {
+                    send_done(0, "", 0);
+                    continue;
+                }
+            }
+
+            auto &engine = contexts[poly_degree];
+            if (!engine) engine = make_unique<EngineContext>(poly_degree);
+
+            auto key_set = key_cache.get(keys_path, engine->context, poly_degree);
+
+            size_t vectors = process_index_folder(query_paths, vector_folder, engine->context, engine->evaluator,
+                                 key_set->relin_keys, key_set->gal_keys, options);
+
+            chrono::duration<double> elapsed = chrono::high_resolution_clock::now() - start_time;
+            cerr << "[BENCHMARK TIME]" << elapsed.count() << endl;
+            send_done(elapsed.count(), "", vectors, options.compr_mode);
+        } catch (const exception &e) {
+            chrono::duration<double> elapsed = chrono::high_resolution_clock::now() - start_time;
+            cerr << "Error: " << e.what() << endl;
+            send_done(elapsed.count(), e.what());
+        }
+    }
+    return 0;
+}
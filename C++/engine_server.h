@@ -0,0 +1,12 @@
+#pragma once
+#include <cstddef>
+
+// --serve 모드: stdin 으로 JSON 요청을 한 줄씩 받아 처리하는 상주 엔진
+//   {"cmd": "search", "query": ..., "vector_folder": ..., "keys_path": ..., "poly_degree": 8192, "threads": 1}
+//   {"cmd": "invalidate", "keys_path": ...}
+//   "compression": "none" / "zlib" / "zstd" 로 결과 직렬화 압축을 지정 (없으면 SEAL 기본값, 지원하지 않으면 none)
+//   "mod_switch": true 면 결과를 마지막 레벨로 mod switch 한 뒤 직렬화
+//   "packed": true 면 문서 점수를 슬롯 하나씩 모아 slot_count 개마다 결과 암호문 하나로 출력 ("index_ids" = 슬롯 -> index_id)
+//   "query" 대신 "queries": [경로, ...] 를 주면 인덱스 벡터를 한 번 읽어서 모든 쿼리를 평가한다.
+// search 요청의 결과는 기존과 같은 JSON 줄로 출력하고 (쿼리 순번 "query" 포함), 마지막에 {"status": "done", ...} 줄을 출력한다.
+int run_server(size_t key_cache_bytes);
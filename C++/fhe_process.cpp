@@ -1,11 +1,17 @@
 #include "fhe_process.h"
 #include "fhe_utils.h"
+#include "index_segments.h"
 #include "base64.h"
 
 #include <seal/seal.h>
+#include <condition_variable>
+#include <deque>
 #include <filesystem>
 #include <fstream>
 #include <iostream>
+#include <memory>
+#include <mutex>
+#include <thread>
 #include <nlohmann/json.hpp>
 
 using json = nlohmann::json;
@@ -13,54 +19,263 @@ using namespace seal;
 using namespace std;
 namespace fs = std::filesystem;
 
-void process_index_folder(const string &query_path, const string &index_folder, seal::SEALContext context, seal::Evaluator &evaluator, seal::RelinKeys relin_keys, seal::GaloisKeys gal_keys) {
-    // 쿼리 로드
-    Ciphertext query;
-    try {
-        query = load_cipher_from_file(query_path, context);
-    } catch (...) {
-        json err; err["error"] = "Failed to load query file";
-        cout << err.dump() << endl;
-        return;
+namespace {
+
+// 읽기 단계가 미리 읽어 둔 인덱스 벡터 하나
+struct ScanItem {
+    const IndexEntry *entry = nullptr;
+    string bytes;
+};
+
+// 읽기 스레드 -> 연산 스레드 사이의 크기 제한 큐 (읽기가 연산보다 너무 앞서 메모리를 쓰지 않도록)
+class ScanQueue {
+public:
+    explicit ScanQueue(size_t capacity) : capacity_(capacity) {}
+
+    void push(ScanItem item) {
+        unique_lock<mutex> lock(mutex_);
+        not_full_.wait(lock, [&] { return items_.size() < capacity_; });
+        items_.push_back(move(item));
+        not_empty_.notify_one();
+    }
+
+    // 큐가 닫히고 비었으면 false
+    bool pop(ScanItem &item) {
+        unique_lock<mutex> lock(mutex_);
+        not_empty_.wait(lock, [&] { return !items_.empty() || closed_; });
+        if (items_.empty()) return false;
+        item = move(items_.front());
+        items_.pop_front();
+        not_full_.notify_one();
+        return true;
     }
 
-    // 폴더에서 파일 목록 가져오기
-    vector<string> index_list = list_index_files(index_folder);
+    void close() {
+        lock_guard<mutex> lock(mutex_);
+        closed_ = true;
+        not_empty_.notify_all();
+    }
+
+private:
+    size_t capacity_;
+    deque<ScanItem> items_;
+    bool closed_ = false;
+    mutex mutex_;
+    condition_variable not_empty_, not_full_;
+};
+
+// packed 모드에서 출력 대기 중인 묶음 하나: 슬롯 i 의 점수는 index_ids[i] 의 것
+struct PackBatch {
+    vector<int64_t> index_ids;
+    Ciphertext acc;
+    bool has_acc = false;
+    size_t filled = 0;   // 더해졌거나(또는 실패로 비운) 슬롯 수
+};
+
+// 쿼리별 packed 상태. current 는 아직 슬롯이 남은 묶음
+struct PackState {
+    mutex guard;
+    shared_ptr<PackBatch> current;
+};
+
+// 여러 연산 스레드가 출력하므로 결과 한 건(줄 또는 헤더 + 바이트)을 통째로 잠금 안에서 출력
+mutex output_mutex;
 
-    for (string &index_path : index_list) {
+void report_error(const IndexEntry &entry, const exception &e) {
+    json err;
+    err["error"] = string("Error processing ") + entry.path + " (index " + to_string(entry.index_id) + "): " + e.what();
+    lock_guard<mutex> lock(output_mutex);
+    cerr << err.dump() << endl;
+}
+
+} // namespace
+
+size_t process_index_folder(const vector<string> &query_paths, const string &index_folder, const seal::SEALContext &context, seal::Evaluator &evaluator, const seal::RelinKeys &relin_keys, const seal::GaloisKeys &gal_keys, const ScanOptions &options) {
+    // 쿼리 로드 (실패한 쿼리는 에러를 출력하고 제외)
+    vector<pair<size_t, Ciphertext>> queries;
+    for (size_t query_no = 0; query_no < query_paths.size(); ++query_no) {
         try {
-            // 인덱스 벡터 로드
-            Ciphertext index = load_cipher_from_file(index_path, context);
+            queries.emplace_back(query_no, load_cipher_from_file(query_paths[query_no], context));
+        } catch (...) {
+            json err; err["error"] = "Failed to load query file"; err["query"] = query_no;
+            cout << err.dump() << endl;
+        }
+    }
+    if (queries.empty()) return 0;
+
+    // 세그먼트 오프셋 테이블(+ legacy .eiv)에서 살아있는 인덱스 목록 가져오기
+    IndexSnapshot snapshot = list_index_entries(index_folder);
+    size_t scanned = 0;
 
-            // 동형 내적 연산 수행 (GaloisKeys 전달)
-            Ciphertext result = fhe_dot_product(query, index, evaluator, relin_keys, gal_keys);
+    size_t threads = options.threads ? options.threads : max(1u, thread::hardware_concurrency());
+    const compr_mode_type compr_mode = options.compr_mode;
+    // 연산 스레드마다 2개씩 미리 읽어 둠
+    ScanQueue queue(threads * 2);
 
-            // 결과 직렬화
-            stringstream ss;
-            result.save(ss);
-            string raw = ss.str();
+    // 결과 암호문 하나를 (mod switch ->) 직렬화해서 출력. fields 는 결과 JSON / 바이너리 헤더에 같이 싣는 값
+    auto emit = [&](json fields, Ciphertext &result) {
+        if (options.mod_switch) {
+            // 클라이언트는 작은 정수 점수만 복호화하므로 나머지 modulus prime 은 버림
+            evaluator.mod_switch_to_inplace(result, context.last_parms_id());
+        }
+
+        // 결과 직렬화 (요청된 SEAL 압축 적용, 클라이언트의 Ciphertext::load 가 그대로 풀 수 있음)
+        stringstream ss;
+        result.save(ss, compr_mode);
+        string raw = ss.str();
+        // 압축 전 크기 (압축률 메트릭용)
+        if (compr_mode != compr_mode_type::none) {
+            fields["raw_length"] = static_cast<size_t>(result.save_size(compr_mode_type::none));
+        }
 
-            // Base64 인코딩 (reinterpret_cast 필요)
-            string encoded_result = base64_encode(reinterpret_cast<const unsigned char*>(raw.c_str()), raw.length());
+        if (options.binary_output) {
+            // 바이너리 모드: 헤더 한 줄 {..., "length"} 뒤에 직렬화 바이트를 그대로 출력 (base64 없음)
+            fields["length"] = raw.size();
+            string header_line = fields.dump() + '\n';
+
+            lock_guard<mutex> lock(output_mutex);
+            cout << header_line;
+            cout.write(raw.data(), static_cast<streamsize>(raw.size()));
+            cout.flush();
+            return;
+        }
 
-            // 파일명에서 index_id 추출
-            string filename = fs::path(index_path).filename().string(); // '123.eiv'
-            string index_id_str = filename.substr(0, filename.find('.')); // '123'
-            int index_id = stoi(index_id_str);
+        // Base64 인코딩 (reinterpret_cast 필요)
+        fields["enc_score"] = base64_encode(reinterpret_cast<const unsigned char*>(raw.c_str()), raw.length());
+        string line = fields.dump();
 
-            // 결과를 JSON 형태로 출력
-            json result_json;
-            result_json["index_id"] = index_id;
-            result_json["enc_score"] = encoded_result;
+        // Python 백엔드가 readline()으로 읽으므로 줄바꿈 필수
+        lock_guard<mutex> lock(output_mutex);
+        cout << line << endl;
+    };
 
-            // Python 백엔드가 readline()으로 읽으므로 줄바꿈 필수
-            cout << result_json.dump() << endl;
+    // packed 모드: 쿼리별로 문서 점수를 슬롯 하나씩 모아 slot_count 개마다 암호문 하나로 출력
+    unique_ptr<BatchEncoder> encoder;
+    size_t slot_count = 0;
+    vector<PackState> packs(options.packed ? queries.size() : 0);
+    if (options.packed) {
+        encoder = make_unique<BatchEncoder>(context);
+        slot_count = encoder->slot_count();
+    }
 
+    // 묶음 출력 ("index_ids" 가 슬롯 -> index_id 맵). 모든 슬롯이 실패한 묶음은 출력하지 않음
+    auto emit_pack = [&](size_t pack_no, PackBatch &batch) {
+        if (!batch.has_acc) return;
+        json fields;
+        fields["index_ids"] = batch.index_ids;
+        fields["query"] = queries[pack_no].first;
+        try {
+            emit(move(fields), batch.acc);
         } catch (const exception& e) {
-            // 개별 파일 에러 시 전체 중단하지 않고 로그 출력 후 계속
             json err;
-            err["error"] = string("Error processing ") + index_path + ": " + e.what();
+            err["error"] = string("Error emitting packed result: ") + e.what();
+            lock_guard<mutex> lock(output_mutex);
             cerr << err.dump() << endl;
         }
+    };
+
+    // 슬롯 하나를 채우고, 묶음이 다 찼으면 출력 (연산 실패한 슬롯은 index_id -1, 점수 0)
+    auto fill_slot = [&](size_t pack_no, const shared_ptr<PackBatch> &batch, size_t slot, Ciphertext *masked) {
+        PackState &pack = packs[pack_no];
+        bool full;
+        {
+            lock_guard<mutex> lock(pack.guard);
+            if (masked == nullptr) {
+                batch->index_ids[slot] = -1;
+            } else if (!batch->has_acc) {
+                batch->acc = move(*masked);
+                batch->has_acc = true;
+            } else {
+                evaluator.add_inplace(batch->acc, *masked);
+            }
+            full = ++batch->filled == slot_count;
+        }
+        if (full) emit_pack(pack_no, *batch);
+    };
+
+    // 연산 단계: 인덱스 벡터를 한 번 로드한 뒤 모든 쿼리에 대해 내적(곱셈, 회전) -> 직렬화 -> 출력
+    // 결과에는 요청의 쿼리 순번("query")을 붙인다. 출력 순서는 보장하지 않음
+    auto compute = [&]() {
+        ScanItem item;
+        while (queue.pop(item)) {
+            const IndexEntry &entry = *item.entry;
+            Ciphertext index;
+            try {
+                index.load(context, reinterpret_cast<const seal_byte *>(item.bytes.data()), item.bytes.size());
+            } catch (const exception& e) {
+                report_error(entry, e);
+                continue;
+            }
+            // 로드가 끝난 원본 바이트는 바로 해제
+            string().swap(item.bytes);
+
+            for (size_t pack_no = 0; pack_no < queries.size(); ++pack_no) {
+                auto &[query_no, query] = queries[pack_no];
+
+                // packed 모드면 연산 전에 슬롯을 예약 (슬롯 순서 = 예약 순서)
+                shared_ptr<PackBatch> batch;
+                size_t slot = 0;
+                if (options.packed) {
+                    PackState &pack = packs[pack_no];
+                    lock_guard<mutex> lock(pack.guard);
+                    if (!pack.current) pack.current = make_shared<PackBatch>();
+                    batch = pack.current;
+                    slot = batch->index_ids.size();
+                    batch->index_ids.push_back(entry.index_id);
+                    if (batch->index_ids.size() == slot_count) pack.current.reset();
+                }
+
+                try {
+                    // 동형 내적 연산 수행 (GaloisKeys 전달). 합산 후 점수는 모든 슬롯에 복제되어 있음
+                    Ciphertext result = fhe_dot_product(query, index, evaluator, relin_keys, gal_keys);
+
+                    if (options.packed) {
+                        // one-hot 마스크를 곱해 예약한 슬롯에만 점수를 남긴 뒤 묶음 암호문에 더함
+                        vector<uint64_t> mask(slot_count, 0);
+                        mask[slot] = 1;
+                        Plaintext mask_plain;
+                        encoder->encode(mask, mask_plain);
+                        evaluator.multiply_plain_inplace(result, mask_plain);
+                        fill_slot(pack_no, batch, slot, &result);
+                        continue;
+                    }
+
+                    json fields;
+                    fields["index_id"] = entry.index_id;
+                    fields["query"] = query_no;
+                    emit(move(fields), result);
+
+                } catch (const exception& e) {
+                    // 개별 파일 에러 시 전체 중단하지 않고 로그 출력 후 계속
+                    report_error(entry, e);
+                    if (batch) fill_slot(pack_no, batch, slot, nullptr);
+                }
+            }
+        }
+    };
+
+    vector<thread> workers;
+    workers.reserve(threads);
+    for (size_t i = 0; i < threads; ++i) workers.emplace_back(compute);
+
+    // 읽기 단계 (현재 스레드): 세그먼트를 오프셋 순서대로 순차 읽기해서 큐에 넣음
+    for (const IndexEntry &entry : snapshot.entries) {
+        // 지정된 index_id 만 평가하는 경우 나머지는 읽지도 않음
+        if (!options.only_ids.empty() && !options.only_ids.count(entry.index_id)) continue;
+        ++scanned;
+        try {
+            queue.push(ScanItem{&entry, read_index_bytes(snapshot, entry)});
+        } catch (const exception& e) {
+            report_error(entry, e);
+        }
+    }
+
+    queue.close();
+    for (thread &worker : workers) worker.join();
+
+    // 다 차지 않은 마지막 묶음 출력 (남은 슬롯은 0)
+    for (size_t pack_no = 0; pack_no < packs.size(); ++pack_no) {
+        if (packs[pack_no].current) emit_pack(pack_no, *packs[pack_no].current);
     }
-}
\ No newline at end of file
+    return scanned;
+}
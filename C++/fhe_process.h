@@ -1,14 +1,34 @@
 #pragma once
+#include <cstdint>
 #include <string>
+#include <unordered_set>
+#include <vector>
 #include <seal/seal.h>
 
 using namespace std;
 
-void process_index_folder(
-    const string &query_path,
+// 검색 요청별 스캔 옵션
+struct ScanOptions {
+    bool binary_output = false;        // true 면 결과를 base64 JSON 대신 길이 헤더 + 원본 바이트로 출력
+    unordered_set<int64_t> only_ids;   // 비어 있지 않으면 이 index_id 들만 연산 (standing query)
+    size_t threads = 1;                // 연산 스레드 수 (0 이면 CPU 코어 수). 읽기는 별도로 한 스레드가 미리 읽음
+    // 결과 직렬화 압축 (none 이 아니면 결과에 "raw_length" 추가)
+    seal::compr_mode_type compr_mode = seal::Serialization::compr_mode_default;
+    // 결과를 마지막 레벨(가장 작은 coeff modulus)로 mod switch 한 뒤 직렬화 (결과 크기 감소, 노이즈 여유 감소)
+    bool mod_switch = false;
+    // 문서별 점수를 one-hot 마스크로 슬롯 하나에 남겨 slot_count 개씩 암호문 하나로 합쳐 출력
+    // 결과에는 "index_id" 대신 슬롯 순서의 "index_ids" (연산 실패 슬롯은 -1) 가 붙는다
+    bool packed = false;
+};
+
+// 검사한 인덱스 벡터 수를 반환
+// 결과 출력 순서는 보장하지 않으며, 결과 한 건(JSON 줄 또는 헤더 + 바이트)은 섞이지 않게 출력한다.
+size_t process_index_folder(
+    const vector<string> &query_paths, // 인덱스 벡터 하나를 읽어서 모든 쿼리에 대해 연산 (결과의 "query" 는 이 목록의 순번)
     const string &index_folder,
-    seal::SEALContext context,
+    const seal::SEALContext &context,
     seal::Evaluator &evaluator,
-    seal::RelinKeys relin_keys,
-    seal::GaloisKeys gal_keys // 추가됨
-);
\ No newline at end of file
+    const seal::RelinKeys &relin_keys,
+    const seal::GaloisKeys &gal_keys, // 추가됨
+    const ScanOptions &options = {}
+);
@@ -7,16 +7,16 @@ using namespace seal;
 using namespace std;
 namespace fs = std::filesystem;
 
-vector<string> list_index_files(const string &folder_path) {
-    vector<string> index_files;
-    if (!fs::exists(folder_path)) return index_files;
-
-    for (const auto &entry : fs::directory_iterator(folder_path)) {
-        if (entry.is_regular_file() && entry.path().extension() == ".eiv") {
-            index_files.push_back(entry.path().string());
-        }
-    }
-    return index_files;
+seal::SEALContext make_bfv_context(size_t poly_degree) {
+    EncryptionParameters params(scheme_type::bfv);
+    params.set_poly_modulus_degree(poly_degree);
+    params.set_coeff_modulus(CoeffModulus::BFVDefault(poly_degree));
+    // Plain Modulus: 결과값(최대 4096)을 담을 수 있게 20비트 정도 설정
+    params.set_plain_modulus(PlainModulus::Batching(poly_degree, 20));
+
+    SEALContext context(params);
+    if (!context.parameters_set()) throw runtime_error("Invalid SEAL parameters");
+    return context;
 }
 
 seal::Ciphertext load_cipher_from_file(const std::string &path, seal::SEALContext context) {
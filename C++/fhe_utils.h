@@ -4,7 +4,8 @@
 #include <vector>
 #include <string>
 
-std::vector<std::string> list_index_files(const std::string &folder_path);
+// BFV 컨텍스트 생성 (one-shot 모드와 --serve 모드가 같은 파라미터를 쓰도록 공통화)
+seal::SEALContext make_bfv_context(size_t poly_degree);
 
 seal::Ciphertext load_cipher_from_file(const std::string &path, seal::SEALContext context);
 
@@ -0,0 +1,147 @@
+#include "index_segments.h"
+
+#include <algorithm>
+#include <filesystem>
+#include <fstream>
+#include <iterator>
+#include <map>
+#include <stdexcept>
+#include <tuple>
+
+#include <fcntl.h>
+#include <sys/file.h>
+#include <unistd.h>
+
+using namespace std;
+namespace fs = std::filesystem;
+
+static const size_t RECORD_SIZE = 24;
+
+// 백엔드가 세그먼트를 추가/압축하는 동안 목록을 읽지 않도록 공유 잠금
+class FolderLock {
+public:
+    explicit FolderLock(const string &folder_path) {
+        fd_ = open((fs::path(folder_path) / ".lock").c_str(), O_RDWR | O_CREAT, 0644);
+        if (fd_ >= 0) flock(fd_, LOCK_SH);
+    }
+    ~FolderLock() {
+        if (fd_ >= 0) {
+            flock(fd_, LOCK_UN);
+            close(fd_);
+        }
+    }
+    FolderLock(const FolderLock &) = delete;
+    FolderLock &operator=(const FolderLock &) = delete;
+
+private:
+    int fd_ = -1;
+};
+
+static bool parse_segment_name(const string &filename, long &number) {
+    // segment_{N}.idx
+    const string prefix = "segment_";
+    if (filename.rfind(prefix, 0) != 0) return false;
+    size_t dot = filename.find('.', prefix.size());
+    if (dot == string::npos || filename.substr(dot) != ".idx") return false;
+    try {
+        number = stol(filename.substr(prefix.size(), dot - prefix.size()));
+    } catch (...) {
+        return false;
+    }
+    return true;
+}
+
+static int64_t read_le_i64(const unsigned char *p) {
+    uint64_t v = 0;
+    for (int i = 7; i >= 0; --i) v = (v << 8) | p[i];
+    return static_cast<int64_t>(v);
+}
+
+IndexSnapshot list_index_entries(const string &folder_path) {
+    IndexSnapshot snapshot;
+    if (!fs::exists(folder_path)) return snapshot;
+
+    map<int64_t, IndexEntry> live;
+    {
+        FolderLock lock(folder_path);
+
+        vector<pair<long, fs::path>> idx_files;
+        for (const auto &entry : fs::directory_iterator(folder_path)) {
+            if (!entry.is_regular_file()) continue;
+            string filename = entry.path().filename().string();
+
+            if (entry.path().extension() == ".eiv") {
+                // legacy: '123.eiv'
+                try {
+                    int64_t index_id = stoll(filename.substr(0, filename.find('.')));
+                    live[index_id] = IndexEntry{index_id, entry.path().string(), 0, 0};
+                } catch (...) {
+                }
+                continue;
+            }
+
+            long number;
+            if (parse_segment_name(filename, number)) idx_files.emplace_back(number, entry.path());
+        }
+        sort(idx_files.begin(), idx_files.end());
+
+        for (const auto &[number, idx_path] : idx_files) {
+            string seg_path = fs::path(idx_path).replace_extension(".seg").string();
+            ifstream in(idx_path, ios::binary);
+            unsigned char record[RECORD_SIZE];
+            // 기록 도중 끊긴 마지막 불완전 레코드는 무시
+            while (in.read(reinterpret_cast<char *>(record), RECORD_SIZE)) {
+                int64_t index_id = read_le_i64(record);
+                uint64_t offset = static_cast<uint64_t>(read_le_i64(record + 8));
+                uint64_t length = static_cast<uint64_t>(read_le_i64(record + 16));
+
+                if (length == 0) {
+                    live.erase(index_id);  // tombstone
+                } else {
+                    live[index_id] = IndexEntry{index_id, seg_path, offset, length};
+                }
+            }
+        }
+
+        // legacy .eiv 도 잠금 안에서 열어 둠 (검색 도중 압축이 세그먼트로 옮기고 지워도 이 스캔에서는 읽을 수 있도록)
+        for (const auto &[index_id, entry] : live) {
+            if (snapshot.segments.count(entry.path)) continue;
+            auto stream = make_shared<ifstream>(entry.path, ios::binary);
+            if (!stream->is_open()) {
+                throw runtime_error((entry.length == 0 ? "File open failed: " : "Segment open failed: ") + entry.path);
+            }
+            snapshot.segments[entry.path] = stream;
+        }
+    }
+
+    auto &entries = snapshot.entries;
+    entries.reserve(live.size());
+    for (auto &[index_id, entry] : live) entries.push_back(move(entry));
+
+    // 같은 세그먼트는 오프셋 순서대로 읽도록 정렬
+    sort(entries.begin(), entries.end(), [](const IndexEntry &a, const IndexEntry &b) {
+        return tie(a.path, a.offset) < tie(b.path, b.offset);
+    });
+    return snapshot;
+}
+
+string read_index_bytes(IndexSnapshot &snapshot, const IndexEntry &entry) {
+    if (entry.length == 0) {
+        // legacy .eiv: 스냅샷에서 열어 둔 파일 전체. 한 번만 읽으므로 읽은 뒤 바로 닫음
+        auto node = snapshot.segments.extract(entry.path);
+        if (node.empty()) throw runtime_error("File load failed: " + entry.path);
+        ifstream &in = *node.mapped();
+        return string(istreambuf_iterator<char>(in), istreambuf_iterator<char>());
+    }
+
+    auto &in = *snapshot.segments.at(entry.path);
+    // 오프셋 순으로 읽으므로 보통은 현재 위치 그대로 이어서 읽음
+    if (static_cast<uint64_t>(in.tellg()) != entry.offset) in.seekg(static_cast<streamoff>(entry.offset));
+
+    string data(entry.length, '\0');
+    if (!in.read(data.data(), static_cast<streamsize>(entry.length))) {
+        in.clear();
+        throw runtime_error("Segment read failed: " + entry.path);
+    }
+    return data;
+}
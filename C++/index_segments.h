@@ -0,0 +1,36 @@
+#pragma once
+
+#include <cstdint>
+#include <fstream>
+#include <map>
+#include <memory>
+#include <string>
+#include <vector>
+
+// 인덱스 폴더 (uploads/index/user_{id}/dict_{v}) 구조
+//   segment_{N}.seg : 암호화 인덱스 벡터(Ciphertext 직렬화 바이트)를 이어 붙인 파일
+//   segment_{N}.idx : 24바이트 레코드 <int64 index_id, uint64 offset, uint64 length> (little endian)
+//                     length == 0 이면 해당 index_id 삭제(tombstone)
+//   {index_id}.eiv  : 세그먼트 도입 이전의 개별 파일 (legacy)
+//   .lock           : 백엔드(추가/압축)와 엔진(목록 읽기)이 flock 으로 공유
+// 레코드는 legacy 파일 -> segment 번호 오름차순 -> 파일 내 순서대로 적용한다.
+
+struct IndexEntry {
+    int64_t index_id;
+    std::string path;   // .seg 또는 legacy .eiv 경로
+    uint64_t offset;
+    uint64_t length;    // legacy .eiv 는 0 (파일 전체)
+};
+
+struct IndexSnapshot {
+    std::vector<IndexEntry> entries;  // 파일/오프셋 순으로 정렬 (순차 읽기용)
+    // 잠금 안에서 미리 열어둔 세그먼트와 legacy .eiv. 이후 압축으로 파일이 지워져도 계속 읽을 수 있음
+    // (legacy 파일은 읽은 뒤 목록에서 빠지면서 닫힘)
+    std::map<std::string, std::shared_ptr<std::ifstream>> segments;
+};
+
+// 살아있는 인덱스 벡터 목록
+IndexSnapshot list_index_entries(const std::string &folder_path);
+
+// entry 하나의 Ciphertext 직렬화 바이트를 읽음 (세그먼트는 순차 읽기, legacy 는 파일 전체)
+std::string read_index_bytes(IndexSnapshot &snapshot, const IndexEntry &entry);
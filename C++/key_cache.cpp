@@ -0,0 +1,83 @@
+#include "key_cache.h"
+
+#include <fstream>
+#include <stdexcept>
+
+using namespace seal;
+using namespace std;
+namespace fs = std::filesystem;
+
+// 직렬화 파일 크기(압축됨)가 아닌 실제 메모리 사용량 기준으로 계산
+static size_t kswitch_keys_bytes(const KSwitchKeys &keys) {
+    size_t total = 0;
+    for (const auto &key_vector : keys.data()) {
+        for (const auto &key : key_vector) {
+            total += key.data().dyn_array().size() * sizeof(uint64_t);
+        }
+    }
+    return total;
+}
+
+KeyCache::KeyCache(size_t budget_bytes) : budget_bytes_(budget_bytes) {}
+
+shared_ptr<KeySet> KeyCache::get(const string &keys_path, const SEALContext &context, size_t poly_degree) {
+    string relin_file = keys_path + "/relin_keys.k";
+    string gal_file = keys_path + "/gal_keys.k";
+    auto relin_mtime = fs::last_write_time(relin_file);
+    auto gal_mtime = fs::last_write_time(gal_file);
+
+    string key = keys_path + "#" + to_string(poly_degree);
+    auto found = index_.find(key);
+    if (found != index_.end()) {
+        auto key_set = found->second->second;
+        if (key_set->relin_mtime == relin_mtime && key_set->gal_mtime == gal_mtime) {
+            lru_.splice(lru_.begin(), lru_, found->second);
+            return key_set;
+        }
+        // 다른 워커 프로세스에서 키가 교체된 경우
+        erase(found->second);
+    }
+
+    auto key_set = make_shared<KeySet>();
+    key_set->keys_path = keys_path;
+    key_set->relin_mtime = relin_mtime;
+    key_set->gal_mtime = gal_mtime;
+
+    ifstream relin_fs(relin_file, ios::binary);
+    if (!relin_fs.is_open()) throw runtime_error("Key load failed: " + relin_file);
+    key_set->relin_keys.load(context, relin_fs);
+
+    ifstream gal_fs(gal_file, ios::binary);
+    if (!gal_fs.is_open()) throw runtime_error("Key load failed: " + gal_file);
+    key_set->gal_keys.load(context, gal_fs);
+
+    key_set->bytes = kswitch_keys_bytes(key_set->relin_keys) + kswitch_keys_bytes(key_set->gal_keys);
+
+    lru_.emplace_front(key, key_set);
+    index_[key] = lru_.begin();
+    used_bytes_ += key_set->bytes;
+    evict_to_budget();
+
+    return key_set;
+}
+
+void KeyCache::invalidate(const string &keys_path) {
+    for (auto it = lru_.begin(); it != lru_.end();) {
+        auto next = std::next(it);
+        if (it->second->keys_path == keys_path) erase(it);
+        it = next;
+    }
+}
+
+void KeyCache::erase(list<Entry>::iterator it) {
+    used_bytes_ -= it->second->bytes;
+    index_.erase(it->first);
+    lru_.erase(it);
+}
+
+void KeyCache::evict_to_budget() {
+    // 방금 로드한 키(맨 앞)는 예산을 넘더라도 유지
+    while (used_bytes_ > budget_bytes_ && lru_.size() > 1) {
+        erase(std::prev(lru_.end()));
+    }
+}
@@ -0,0 +1,46 @@
+#pragma once
+
+#include <seal/seal.h>
+#include <filesystem>
+#include <list>
+#include <memory>
+#include <string>
+#include <unordered_map>
+
+// 한 사용자의 연산 키 묶음 (메모리에 상주)
+struct KeySet {
+    std::string keys_path;
+    seal::RelinKeys relin_keys;
+    seal::GaloisKeys gal_keys;
+    size_t bytes = 0;
+
+    // 키 파일이 다시 업로드되었는지 확인하기 위한 수정 시각
+    std::filesystem::file_time_type relin_mtime;
+    std::filesystem::file_time_type gal_mtime;
+};
+
+// 사용자별 KeySet LRU 캐시 (메모리 예산 초과 시 가장 오래 안 쓴 키부터 해제)
+class KeyCache {
+public:
+    explicit KeyCache(size_t budget_bytes);
+
+    // keys_path/relin_keys.k, keys_path/gal_keys.k 를 캐시에서 찾고, 없거나 파일이 바뀌었으면 새로 로드
+    std::shared_ptr<KeySet> get(const std::string &keys_path, const seal::SEALContext &context, size_t poly_degree);
+
+    // 해당 경로의 키를 모두 캐시에서 제거 (키 재업로드 시 백엔드가 호출)
+    void invalidate(const std::string &keys_path);
+
+    size_t used_bytes() const { return used_bytes_; }
+    size_t size() const { return lru_.size(); }
+
+private:
+    using Entry = std::pair<std::string, std::shared_ptr<KeySet>>;
+
+    size_t budget_bytes_;
+    size_t used_bytes_ = 0;
+    std::list<Entry> lru_; // 앞쪽이 최근 사용
+    std::unordered_map<std::string, std::list<Entry>::iterator> index_;
+
+    void erase(std::list<Entry>::iterator it);
+    void evict_to_budget();
+};
@@ -4,6 +4,8 @@
 #include <filesystem>
 #include <fstream>
 #include "fhe_process.h"
+#include "fhe_utils.h"
+#include "engine_server.h"
 #include <seal/seal.h>
 
 using namespace std;
@@ -13,6 +15,11 @@ using namespace seal;
 struct Args {
     string query_path, vector_folder, keys_path;
     size_t poly_degree = 8192; // BFV는 4096으로도 충분 (속도 향상)
+    bool serve = false;        // 상주 모드 (stdin 요청 처리)
+    size_t key_cache_mb = 1024; // 상주 모드의 키 캐시 메모리 예산
+    size_t threads = 1;        // 연산 스레드 수 (0 이면 CPU 코어 수)
+    bool mod_switch = false;   // 결과를 마지막 레벨로 mod switch
+    bool packed = false;       // 문서 점수를 슬롯별로 묶어서 출력
 };
 
 Args parse_arguments(int argc, char* argv[]) {
@@ -23,6 +30,11 @@ Args parse_arguments(int argc, char* argv[]) {
         else if (arg == "--vector-folder" && i + 1 < argc) args.vector_folder = argv[++i];
         else if (arg == "--keys-path" && i + 1 < argc) args.keys_path = argv[++i];
         else if (arg == "--poly-degree" && i + 1 < argc) args.poly_degree = stoi(argv[++i]);
+        else if (arg == "--serve") args.serve = true;
+        else if (arg == "--key-cache-mb" && i + 1 < argc) args.key_cache_mb = stoul(argv[++i]);
+        else if (arg == "--threads" && i + 1 < argc) args.threads = stoul(argv[++i]);
+        else if (arg == "--mod-switch") args.mod_switch = true;
+        else if (arg == "--packed") args.packed = true;
     }
     return args;
 }
@@ -30,20 +42,18 @@ Args parse_arguments(int argc, char* argv[]) {
 int main(int argc, char* argv[]) {
     try {
         Args args = parse_arguments(argc, argv);
+        if (args.serve) {
+            return run_server(args.key_cache_mb * 1024 * 1024);
+        }
+
         if (args.query_path.empty() || args.vector_folder.empty() || args.keys_path.empty()) {
-            cerr << "Usage: ./fhe_search_engine --query <path> --vector-folder <path> --keys-path <path>" << endl;
+            cerr << "Usage: ./fhe_search_engine --query <path> --vector-folder <path> --keys-path <path> [--threads <N>] [--mod-switch]" << endl;
+            cerr << "       ./fhe_search_engine --serve [--key-cache-mb <MB>]" << endl;
             return 1;
         }
 
         // [핵심 변경] 1. BFV Context 설정
-        EncryptionParameters params(scheme_type::bfv);
-        params.set_poly_modulus_degree(args.poly_degree);
-        params.set_coeff_modulus(CoeffModulus::BFVDefault(args.poly_degree));
-        // Plain Modulus: 결과값(최대 4096)을 담을 수 있게 20비트 정도 설정
-        params.set_plain_modulus(PlainModulus::Batching(args.poly_degree, 20));
-
-        SEALContext context(params);
-        if (!context.parameters_set()) throw runtime_error("Invalid SEAL parameters");
+        SEALContext context = make_bfv_context(args.poly_degree);
 
         Evaluator evaluator(context);
 
@@ -59,7 +69,11 @@ int main(int argc, char* argv[]) {
 
         auto start_time = chrono::high_resolution_clock::now();
         // 3. 실행
-        process_index_folder(args.query_path, args.vector_folder, context, evaluator, relin_keys, gal_keys);
+        ScanOptions options;
+        options.threads = args.threads;
+        options.mod_switch = args.mod_switch;
+        options.packed = args.packed;
+        process_index_folder({args.query_path}, args.vector_folder, context, evaluator, relin_keys, gal_keys, options);
 
         auto end_time = chrono::high_resolution_clock::now();
         chrono::duration<double> elasped = end_time - start_time;
@@ -0,0 +1,356 @@
+"""HTTP 엔드포인트 벤치마크
+
+main.py 의 FastAPI app 을 (기본) 로컬 SQLite 에 띄우고, 합성 데이터(사용자, 폴더 트리, 파일, 사전)를 채운 뒤
+폴더 목록 / 파일 정보(breadcrumb) / 업로드 / 다운로드 / 폴더 재귀 삭제 / 사전 다운로드의
+p50, p99 지연시간과 처리량을 측정해서 JSON 으로 저장한다.
+
+    python benchmarks/bench_endpoints.py --users 2 --depth 4 --fanout 3 --files-per-folder 20 -o result.json
+    python benchmarks/bench_endpoints.py --compare result.json -o result_new.json
+
+MySQL 컨테이너 등으로 측정하려면 --database-url 에 빈 DB 를 가리키는 URL 을 넘긴다. (테이블은 app 이 만든다)
+요청은 httpx 의 ASGITransport 로 app 을 직접 호출하므로 네트워크 / uvicorn 비용은 포함되지 않는다.
+"""
+import argparse
+import asyncio
+import base64
+import json
+import math
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SCENARIOS = ("list", "list_page", "file_info", "upload", "download", "delete_tree", "dict_download", "dict_raw")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="HE Cloud HTTP endpoint benchmark")
+    parser.add_argument("--database-url", default=None, help="기본값: 작업 폴더의 SQLite 파일")
+    parser.add_argument("--workdir", default=None, help="uploads/ 와 SQLite 파일을 둘 폴더 (기본값: 임시 폴더)")
+    parser.add_argument("--users", type=int, default=1)
+    parser.add_argument("--depth", type=int, default=3, help="폴더 트리 깊이")
+    parser.add_argument("--fanout", type=int, default=3, help="폴더당 하위 폴더 수")
+    parser.add_argument("--files-per-folder", type=int, default=10)
+    parser.add_argument("--dicts", type=int, default=2, help="사용자당 사전 버전 수")
+    parser.add_argument("--dict-kb", type=int, default=256)
+    parser.add_argument("--file-kb", type=int, default=64)
+    parser.add_argument("--vector-kb", type=int, default=128)
+    parser.add_argument("--requests", type=int, default=50, help="시나리오별 측정 요청 수")
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("-o", "--output", default="bench_result.json")
+    parser.add_argument("--compare", default=None, help="이전 결과 JSON 과 p50/p99 비교")
+    return parser.parse_args()
+
+
+def setup_environment(args):
+    # db.py / settings.py 가 import 시점에 환경 변수를 읽으므로 app 을 import 하기 전에 설정
+    workdir = args.workdir or tempfile.mkdtemp(prefix="he_bench_")
+    os.makedirs(workdir, exist_ok=True)
+    os.chdir(workdir)  # 라우트들이 상대 경로 "uploads" 를 사용
+    os.environ["DATABASE_URL"] = args.database_url or f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    os.environ.setdefault("SECRET_KEY", "bench-secret")
+    sys.path.insert(0, REPO_ROOT)
+    return workdir
+
+
+# ----------------
+# 합성 데이터
+# ----------------
+
+def seed(args, rng):
+    from db import SessionLocal
+    from models import User, Dictionary, Folder, File, IndexVector
+    from utils.blob_store import put_blob
+    from utils.folder_path import child_path
+    from utils.segment_store import append_vectors
+    from utils.upload import temp_path_for, remove_quietly
+
+    db = SessionLocal()
+    data = {"users": []}
+    try:
+        for u in range(args.users):
+            user = User(email=f"bench{u}_{rng.randrange(1 << 30)}@bench.local", status="verified", salt="",
+                        argon_mem=65536, argon_time=3, argon_parallel=1, pk="pk", has_eval_keys=False)
+            db.add(user)
+            db.flush()
+
+            dict_rows = []
+            for version in range(1, args.dicts + 1):
+                # 실제 사전은 JSON 문자열로 업로드되므로 (UTF-8 bytes) base64 텍스트로 채움
+                content_hash = put_blob(base64.b64encode(rng.randbytes(args.dict_kb * 1024 * 3 // 4)))
+                dict_row = Dictionary(owner_id=user.id, version=version, content_hash=content_hash, scheme="BFV",
+                                      poly_degree=8192, slot_count=8192, encoding="BATCH")
+                db.add(dict_row)
+                dict_rows.append(dict_row)
+            db.flush()
+
+            user_folder = os.path.join("uploads", f"user_{user.id}")
+            vector_folder = os.path.join("uploads", "index", f"user_{user.id}", f"dict_{dict_rows[0].version}")
+            os.makedirs(user_folder, exist_ok=True)
+            os.makedirs(vector_folder, exist_ok=True)
+
+            # 폴더 트리: 루트 아래 fanout 개씩 depth 단계
+            folders = []  # (id, depth)
+            level = [(None, "/")]
+            for depth in range(1, args.depth + 1):
+                next_level = []
+                for parent_id, parent_path in level:
+                    for _ in range(args.fanout):
+                        folder = Folder(owner_id=user.id, enc_name=f"f{rng.randrange(1 << 30)}", parent_id=parent_id)
+                        db.add(folder)
+                        db.flush()
+                        folder.path = child_path(parent_path if parent_id else None, folder.id)
+                        next_level.append((folder.id, folder.path))
+                        folders.append((folder.id, depth))
+                level = next_level
+
+            # 파일 + 인덱스 벡터 (세그먼트에 한 번에 추가)
+            file_ids, deepest_file_ids = [], []
+            vector_items = []
+            enc_payload = rng.randbytes(args.file_kb * 1024)
+            vector_payload = rng.randbytes(args.vector_kb * 1024)
+            vector_src = temp_path_for(os.path.join(vector_folder, "bench"))
+            with open(vector_src, "wb") as f:
+                f.write(vector_payload)
+
+            for folder_id, depth in [(None, 0)] + folders:
+                for _ in range(args.files_per_folder):
+                    file_row = File(owner_id=user.id, folder_id=folder_id, cipher_title=f"t{rng.randrange(1 << 30)}",
+                                    mime="application/octet-stream", file_path=user_folder)
+                    db.add(file_row)
+                    db.flush()
+                    with open(os.path.join(user_folder, f"{file_row.id}.enc"), "wb") as f:
+                        f.write(enc_payload)
+
+                    index_row = IndexVector(owner_id=user.id, doc_id=file_row.id, dict_id=dict_rows[0].id,
+                                            vector_path=vector_folder)
+                    db.add(index_row)
+                    db.flush()
+                    vector_items.append((index_row.id, vector_src))
+
+                    file_ids.append(file_row.id)
+                    if depth == args.depth:
+                        deepest_file_ids.append(file_row.id)
+
+            append_vectors(vector_folder, vector_items)
+            remove_quietly(vector_src)
+
+            data["users"].append({
+                "id": user.id,
+                "email": user.email,
+                "folders": [folder_id for folder_id, _ in folders],
+                "top_folders": [folder_id for folder_id, depth in folders if depth == 1],
+                "files": file_ids,
+                "deepest_files": deepest_file_ids or file_ids,
+                "dict_versions": [dict_row.version for dict_row in dict_rows],
+            })
+        db.commit()
+    finally:
+        db.close()
+    return data
+
+
+def seed_delete_targets(user_id: int, count: int, args, rng):
+    # 재귀 삭제 측정용: 요청마다 지울 작은 하위 트리 (depth 2, fanout 2, 폴더당 파일 files_per_folder 개)
+    from db import SessionLocal
+    from models import Folder, File, IndexVector, Dictionary
+    from utils.folder_path import child_path
+
+    db = SessionLocal()
+    targets = []
+    try:
+        dict_row = db.query(Dictionary).filter(Dictionary.owner_id == user_id).first()
+        vector_folder = os.path.join("uploads", "index", f"user_{user_id}", f"dict_{dict_row.version}")
+        for _ in range(count):
+            root = Folder(owner_id=user_id, enc_name="del", parent_id=None)
+            db.add(root)
+            db.flush()
+            root.path = child_path(None, root.id)
+            level = [root]
+            for _ in range(2):
+                next_level = []
+                for parent in level:
+                    for _ in range(2):
+                        child = Folder(owner_id=user_id, enc_name="del", parent_id=parent.id)
+                        db.add(child)
+                        db.flush()
+                        child.path = child_path(parent.path, child.id)
+                        next_level.append(child)
+                level = next_level
+                for folder in level:
+                    for _ in range(args.files_per_folder):
+                        file_row = File(owner_id=user_id, folder_id=folder.id, cipher_title="del",
+                                        mime="application/octet-stream", file_path="uploads")
+                        db.add(file_row)
+                        db.flush()
+                        db.add(IndexVector(owner_id=user_id, doc_id=file_row.id, dict_id=dict_row.id,
+                                           vector_path=vector_folder))
+            targets.append(root.id)
+        db.commit()
+    finally:
+        db.close()
+    return targets
+
+
+# ----------------
+# 측정
+# ----------------
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    if not ordered:
+        return None
+    # nearest-rank
+    index = min(len(ordered) - 1, max(0, math.ceil(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+async def measure(name, make_request, count, warmup, concurrency):
+    for i in range(warmup):
+        await make_request(i)
+
+    latencies = []
+    errors = 0
+    slots = asyncio.Semaphore(concurrency)
+
+    async def one(i):
+        nonlocal errors
+        async with slots:
+            start = time.perf_counter()
+            response = await make_request(warmup + i)
+            latencies.append(time.perf_counter() - start)
+            if response.status_code >= 400:
+                errors += 1
+
+    wall_start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(count)))
+    wall = time.perf_counter() - wall_start
+
+    result = {
+        "requests": count,
+        "errors": errors,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "mean_ms": statistics.mean(latencies) * 1000,
+        "throughput_rps": count / wall if wall > 0 else None,
+    }
+    print(f"{name:14s} p50={result['p50_ms']:8.2f}ms  p99={result['p99_ms']:8.2f}ms  "
+          f"{result['throughput_rps']:8.1f} req/s  errors={errors}")
+    return result
+
+
+async def run(args, data, rng):
+    import httpx
+    from main import app
+    from utils.token import create_access_token
+
+    user = data["users"][0]
+    headers = {"Authorization": f"Bearer {create_access_token({'email': user['email'], 'user_id': user['id']})}"}
+    scenarios = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    total = args.requests + args.warmup
+
+    file_payload = rng.randbytes(args.file_kb * 1024)
+    vector_payload = rng.randbytes(args.vector_kb * 1024)
+    list_targets = [0] + user["folders"]
+
+    delete_targets = []
+    if "delete_tree" in scenarios:
+        delete_targets = seed_delete_targets(user["id"], total, args, rng)
+
+    # 500 도 응답으로 받아서 errors 로 집계
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+    results = {}
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        requests = {
+            "list": lambda i: client.post("/api/folder/list", headers=headers,
+                                          json={"folder_id": rng.choice(list_targets)}),
+            "list_page": lambda i: client.post("/api/folder/list/page", headers=headers,
+                                               json={"folder_id": rng.choice(list_targets), "limit": 100}),
+            "file_info": lambda i: client.post(f"/api/file/{rng.choice(user['deepest_files'])}", headers=headers),
+            "upload": lambda i: client.post(
+                "/api/file/upload", headers=headers,
+                data={"cipher_title": "bench", "folder_id": "0", "mime": "application/octet-stream",
+                      "dict_version_list": json.dumps([user["dict_versions"][0]])},
+                files=[("enc_file", ("f", file_payload)), ("index_vectors", ("v", vector_payload))],
+            ),
+            "download": lambda i: client.post("/api/file/download", headers=headers,
+                                              json={"file_id": rng.choice(user["files"])}),
+            "delete_tree": lambda i: client.post("/api/delete", headers=headers,
+                                                 json={"type": "folder", "id": delete_targets[i]}),
+            "dict_download": lambda i: client.post("/api/dict/download", headers=headers, json={}),
+            "dict_raw": lambda i: client.get(f"/api/dict/{rng.choice(user['dict_versions'])}/raw", headers=headers),
+        }
+
+        for name in scenarios:
+            if name not in requests:
+                print(f"알 수 없는 시나리오: {name}")
+                continue
+            results[name] = await measure(name, requests[name], args.requests, args.warmup, args.concurrency)
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(previous_path, results):
+    with open(previous_path) as f:
+        previous = json.load(f)["results"]
+
+    print(f"\n비교 대상: {previous_path}")
+    for name, current in results.items():
+        before = previous.get(name)
+        if not before:
+            continue
+        for key in ("p50_ms", "p99_ms"):
+            change = (current[key] - before[key]) / before[key] * 100 if before[key] else 0
+            print(f"{name:14s} {key}: {before[key]:8.2f} -> {current[key]:8.2f} ms ({change:+.1f}%)")
+
+
+def main():
+    args = parse_args()
+    output = os.path.abspath(args.output)
+    compare_path = os.path.abspath(args.compare) if args.compare else None
+    workdir = setup_environment(args)
+    rng = random.Random(args.seed)
+
+    import main as app_module  # noqa: F401  (create_all 로 테이블 생성)
+
+    seed_start = time.perf_counter()
+    data = seed(args, rng)
+    print(f"seed: {args.users} users, {len(data['users'][0]['folders'])} folders/user, "
+          f"{len(data['users'][0]['files'])} files/user ({time.perf_counter() - seed_start:.1f}s) in {workdir}")
+
+    results = asyncio.run(run(args, data, rng))
+
+    report = {
+        "created_at": datetime.utcnow().isoformat(),
+        "git_commit": git_commit(),
+        "python": platform.python_version(),
+        "database": os.environ["DATABASE_URL"].split("://")[0],
+        "config": {key: value for key, value in vars(args).items() if key not in ("output", "compare", "workdir", "database_url")},
+        "results": results,
+    }
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\n결과 저장: {output}")
+
+    if compare_path:
+        compare(compare_path, results)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,41 @@
+import time
+from dataclasses import dataclass
+
 from fastapi import Depends, HTTPException
 from fastapi.security import OAuth2PasswordBearer
 from jose import jwt, JWTError
+from sqlalchemy import select
 from utils.token import SECRET_KEY, ALGORITHM
-from db import SessionLocal
+from utils.cache import TTLCache
+from db import AsyncSessionLocal
 from models import User
+from settings import AUTH_CACHE_SIZE, AUTH_CACHE_TTL_SECONDS
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 
-def get_current_user(token: str = Depends(oauth2_scheme)):
+
+# 라우트에서 실제로 쓰는 작은 필드만 보관 (공개키 등 LONGTEXT 컬럼은 읽지 않음)
+@dataclass(frozen=True)
+class AuthUser:
+    id: int
+    email: str
+    has_eval_keys: bool
+
+
+# 검증이 끝난 token -> AuthUser
+auth_cache = TTLCache(maxsize=AUTH_CACHE_SIZE, ttl=AUTH_CACHE_TTL_SECONDS)
+
+
+def invalidate_user(user_id: int):
+    """키 업로드, 계정 정보 변경 시 해당 사용자의 캐시 항목을 모두 제거"""
+    auth_cache.discard_where(lambda cached: cached.id == user_id)
+
+
+async def get_current_user(token: str = Depends(oauth2_scheme)):
+    cached = auth_cache.get(token)
+    if cached is not None:
+        return cached
+
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         user_id = payload.get("user_id")
@@ -18,10 +46,19 @@ def get_current_user(token: str = Depends(oauth2_scheme)):
     except JWTError:
         raise HTTPException(status_code=401, detail="유효하지 않거나, 만료된 토큰입니다.")
 
-    db = SessionLocal()
-    user = db.query(User).filter(User.email == email, User.id == user_id).first()
-    db.close()
+    # 이벤트 루프를 막지 않도록 비동기 세션으로 조회
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            select(User.id, User.email, User.has_eval_keys).filter(User.email == email, User.id == user_id)
+        )
+        row = result.first()
 
-    if user is None:
+    if row is None:
         raise HTTPException(status_code=404, detail="존재하지 않는 회원입니다.")
-    return user
\ No newline at end of file
+
+    user = AuthUser(id=row.id, email=row.email, has_eval_keys=bool(row.has_eval_keys))
+
+    # 토큰 만료 시각을 넘겨서 캐시하지 않음
+    expires_in = payload.get("exp", time.time() + AUTH_CACHE_TTL_SECONDS) - time.time()
+    auth_cache.set(token, user, ttl=expires_in)
+    return user
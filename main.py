@@ -1,4 +1,7 @@
-from fastapi import FastAPI
+import asyncio
+import time
+
+from fastapi import FastAPI, Request
 from routes.register import router as register_router
 from routes.login import router as login_router
 from routes.folder import router as folder_router
@@ -7,9 +10,15 @@ from routes.delete import router as delete_router
 from routes.search import router as search_router
 from routes.dictionary import router as dict_router
 from routes.keys import router as keys_router
+from routes.standing import router as standing_router
+from routes.metrics import router as metrics_router
 
 from db import engine
 from models import Base
+from utils.engine_pool import engine_pool
+from utils.password import argon2_pool
+from utils.metrics import HTTP_REQUEST_SECONDS
+from utils.query_spool import run_query_gc
 
 Base.metadata.create_all(bind=engine)
 
@@ -22,4 +31,38 @@ app.include_router(file_router, prefix="/api")
 app.include_router(delete_router, prefix="/api")
 app.include_router(search_router, prefix="/api")
 app.include_router(dict_router, prefix="/api")
-app.include_router(keys_router, prefix="/api")
\ No newline at end of file
+app.include_router(keys_router, prefix="/api")
+app.include_router(standing_router, prefix="/api")
+app.include_router(metrics_router)
+
+
+@app.middleware("http")
+async def record_request_latency(request: Request, call_next):
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        # 경로 파라미터가 들어간 실제 URL 대신 라우트 템플릿으로 집계 (라벨 수가 늘어나지 않도록)
+        route = request.scope.get("route")
+        HTTP_REQUEST_SECONDS.observe(
+            time.perf_counter() - start,
+            method=request.method,
+            route=route.path if route is not None else "unmatched",
+            status=status,
+        )
+
+
+@app.on_event("startup")
+async def start_query_gc():
+    # 오래된 쿼리 파일 정리 루프
+    app.state.query_gc_task = asyncio.create_task(run_query_gc())
+
+
+@app.on_event("shutdown")
+async def shutdown_engine_pool():
+    app.state.query_gc_task.cancel()
+    await engine_pool.shutdown()
+    argon2_pool.shutdown()
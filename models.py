@@ -1,10 +1,15 @@
 from datetime import datetime
 
-from sqlalchemy import Column, String, Integer, Text, ForeignKey, LargeBinary, DateTime, Boolean
+from sqlalchemy import Column, String, Integer, Text, ForeignKey, LargeBinary, DateTime, Boolean, Index
 # [추가] MySQL의 대용량 데이터 저장을 위한 타입 임포트
 from sqlalchemy.dialects.mysql import LONGTEXT, LONGBLOB
+from sqlalchemy.orm import deferred
 from db import Base
 
+# MySQL 에서는 LONGTEXT/LONGBLOB, 그 외(로컬 SQLite 등)에서는 일반 Text/LargeBinary
+LongText = Text().with_variant(LONGTEXT, "mysql")
+LongBlob = LargeBinary().with_variant(LONGBLOB, "mysql")
+
 
 class User(Base):
     __tablename__ = "users"
@@ -13,10 +18,10 @@ class User(Base):
     email = Column(String(255), unique=True, index=True)
 
     # 동형암호 공개키는 매우 크기 때문에 LONGTEXT 필수
-    pk = Column(LONGTEXT)
-    enc_sk = Column(LONGTEXT, nullable=True)
+    pk = Column(LongText)
+    enc_sk = Column(LongText, nullable=True)
 
-    enc_mk = Column(LONGTEXT, nullable=True)  # AES 키는 작아서 Text로 충분
+    enc_mk = Column(LongText, nullable=True)  # AES 키는 작아서 Text로 충분
     pw_verifier = Column(Text, nullable=True)
     salt = Column(Text)
     argon_mem = Column(Integer)
@@ -35,9 +40,16 @@ class Dictionary(Base):
     owner_id = Column(Integer, ForeignKey("users.id"))
     version = Column(Integer, index=True)
 
-    # [변경] LargeBinary(BLOB, 64KB) -> LONGBLOB(4GB)
-    # 사전 데이터가 클 경우를 대비해 LONGBLOB 사용
-    enc_vocab = Column(LONGBLOB, nullable=False)
+    # 사전 데이터는 blob 저장소(uploads/blobs)에 content_hash 이름으로 저장하고 테이블에는 hash 만 남긴다.
+    # enc_vocab 은 blob 저장소 도입 이전 행에만 남아 있으며, 처음 조회될 때 blob 으로 옮기고 NULL 로 비운다.
+    # 행을 조회할 때마다 LONGBLOB 을 읽지 않도록 deferred
+    enc_vocab = deferred(Column(LongBlob, nullable=True))
+    # 사전 데이터의 sha256 (hex). blob 파일 이름이자 ETag / manifest 에 사용
+    content_hash = Column(String(64), nullable=True)
+    # 이 사전 버전의 인덱스 벡터 집합이 바뀔 때마다(파일 업로드/삭제) 1 증가. 검색 결과 캐시 키에 사용
+    index_generation = Column(Integer, nullable=False, default=0, server_default="0")
+    # 검색 결과 암호문을 마지막 레벨로 mod switch 해서 보낼지 여부 (결과 크기 감소, 노이즈 여유가 충분한 파라미터에서만 사용)
+    mod_switch = Column(Boolean, nullable=False, default=False, server_default="0")
 
     scheme = Column(String(50))
     poly_degree = Column(Integer)
@@ -52,12 +64,17 @@ class File(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     owner_id = Column(Integer, ForeignKey("users.id"))
-    cipher_title = Column(LONGTEXT, nullable=False)
+    cipher_title = Column(LongText, nullable=False)
     file_path = Column(String(500), nullable=False)  # 경로가 길어질 수 있으므로 넉넉하게
     mime = Column(String(100))
     uploaded_at = Column(DateTime, default=datetime.utcnow)
     folder_id = Column(Integer, ForeignKey("folders.id"), nullable=True)
 
+    # 폴더 목록 조회 (owner_id, folder_id 조건 + id 순 키셋 페이지네이션)
+    __table_args__ = (
+        Index("ix_files_owner_folder_id", "owner_id", "folder_id", "id"),
+    )
+
 
 # 유저가 올린 문서에 대한 인덱스 벡터
 class IndexVector(Base):
@@ -67,7 +84,7 @@ class IndexVector(Base):
     owner_id = Column(Integer, ForeignKey("users.id"))
     doc_id = Column(Integer, ForeignKey("files.id"), index=True)
     dict_id = Column(Integer, ForeignKey("dictionaries.id"))
-    vector_path = Column(LONGTEXT, nullable=False)
+    vector_path = Column(LongText, nullable=False)
 
 
 class Folder(Base):
@@ -75,6 +92,46 @@ class Folder(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     owner_id = Column(Integer, ForeignKey("users.id"))
-    enc_name = Column(LONGTEXT, nullable=False)
+    enc_name = Column(LongText, nullable=False)
     parent_id = Column(Integer, ForeignKey("folders.id"), nullable=True)
-    created_at = Column(DateTime, default=datetime.utcnow)
\ No newline at end of file
+    # 루트부터 자기 자신까지의 폴더 id 경로 ("/3/8/15/"), breadcrumb 을 한 번에 조회하기 위해 사용
+    path = Column(String(1000), nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    # 하위 폴더 목록 조회 (owner_id, parent_id 조건 + id 순 키셋 페이지네이션)
+    __table_args__ = (
+        Index("ix_folders_owner_parent_id", "owner_id", "parent_id", "id"),
+    )
+
+# 등록해 두면 새 문서가 업로드될 때마다 그 문서의 인덱스 벡터에 대해서만 평가되는 검색 쿼리
+class StandingQuery(Base):
+    __tablename__ = "standing_queries"
+
+    id = Column(Integer, primary_key=True, index=True)
+    owner_id = Column(Integer, ForeignKey("users.id"))
+    dict_id = Column(Integer, ForeignKey("dictionaries.id"))
+    dict_version = Column(Integer)
+    query_path = Column(String(500), nullable=False)  # 쿼리 암호문 파일 (uploads/standing/user_{id}/...)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    # 업로드 시 (owner_id, dict_id) 로 평가할 쿼리 조회
+    __table_args__ = (
+        Index("ix_standing_queries_owner_dict", "owner_id", "dict_id"),
+    )
+
+
+# 결과를 받을 웹소켓이 연결되어 있지 않을 때 standing query 결과를 보관하는 수신함
+class StandingResult(Base):
+    __tablename__ = "standing_results"
+
+    id = Column(Integer, primary_key=True, index=True)
+    owner_id = Column(Integer, ForeignKey("users.id"))
+    standing_query_id = Column(Integer, ForeignKey("standing_queries.id"), index=True)
+    file_id = Column(Integer, ForeignKey("files.id"))
+    enc_score = Column(LongText, nullable=False)  # base64 결과 암호문
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    # 수신함 조회 (owner_id 조건 + id 순 커서)
+    __table_args__ = (
+        Index("ix_standing_results_owner_id", "owner_id", "id"),
+    )
@@ -1,10 +1,13 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, BackgroundTasks
 from pydantic import BaseModel
+from sqlalchemy import select, literal_column
 from sqlalchemy.orm import Session
 
 from db import SessionLocal
-from models import File, IndexVector, User, Folder
-from dependencies.auth import get_current_user
+from models import File, IndexVector, Folder, Dictionary, StandingResult
+from dependencies.auth import get_current_user, AuthUser
+from utils.index_map import invalidate_index_map
+from utils.segment_store import write_tombstones, compact, lock_folders
 import os
 
 router = APIRouter()
@@ -29,72 +32,138 @@ class DeleteRequest(BaseModel):
     id: int
 
 
-# 공통 삭제 함수: 인덱스 파일(.eiv)과 원본 파일(.enc)을 모두 물리적으로 삭제하고 DB도 정리
-def delete_file_and_index(db: Session, user_id: int, file_id: int):
-    # 1. 삭제할 인덱스 벡터 조회 (물리 파일 삭제를 위해)
-    index_vectors = db.query(IndexVector).filter(IndexVector.doc_id == file_id).all()
-
-    # 2. 물리적 인덱스 파일 삭제
-    for idx in index_vectors:
-        # 저장 경로 규칙: vector_path/{id}.eiv
-        idx_file_path = os.path.join(idx.vector_path, f"{idx.id}.eiv")
-        if os.path.exists(idx_file_path):
-            try:
-                os.remove(idx_file_path)
-            except OSError:
-                pass  # 파일이 없거나 지울 수 없으면 패스
-
-    # [핵심 수정] 3. DB에서 인덱스 벡터 '즉시' 삭제 (Bulk Delete)
-    # 이렇게 해야 파일 삭제 시점에 외래키 걸림돌이 사라집니다.
-    db.query(IndexVector).filter(IndexVector.doc_id == file_id).delete(synchronize_session=False)
-
-    # 4. 실제 암호화 파일 삭제 (물리 파일)
-    file_path = os.path.join(UPLOAD_FOLDER, f"user_{user_id}", f"{file_id}.enc")
-    if os.path.exists(file_path):
+# IN 절 하나에 넣을 최대 id 개수
+IN_CHUNK_SIZE = 500
+
+
+def chunked(ids, size=IN_CHUNK_SIZE):
+    ids = list(ids)
+    for i in range(0, len(ids), size):
+        yield ids[i:i + size]
+
+
+# DB 커밋 후 물리 파일 일괄 삭제 (BackgroundTasks 에서 실행)
+def unlink_paths(paths):
+    for path in paths:
         try:
-            os.remove(file_path)
+            os.remove(path)
         except OSError:
-            pass
+            pass  # 파일이 없거나 지울 수 없으면 패스
 
-    # 5. 파일 DB 삭제
-    db.query(File).filter(File.owner_id == user_id, File.id == file_id).delete(synchronize_session=False)
 
+# 커밋과 tombstone 기록을 인덱스 폴더 잠금 안에서 처리
+# 커밋 후 tombstone 을 늦게 쓰면, 그 사이 삭제된 id 를 재사용한 업로드(SQLite rowid)의 레코드를 가려버린다.
+# 업로드의 append 도 같은 잠금을 잡으므로 재사용된 id 의 레코드는 항상 tombstone 뒤에 기록된다.
+def commit_with_tombstones(db: Session, tombstones):
+    with lock_folders(tombstones):
+        db.commit()
+        for vector_folder, index_ids in tombstones.items():
+            write_tombstones(vector_folder, index_ids, locked=True)
 
-def delete_folder_recursive(db: Session, user_id: int, folder_id: int):
-    # 현재 폴더 확인
-    folder = db.query(Folder).filter(Folder.owner_id == user_id, Folder.id == folder_id).first()
-    if not folder:
-        # 이미 삭제되었거나 없으면 스킵
-        return
 
-    # 1. 현재 폴더 내의 모든 파일 삭제
-    file_ids = find_all_files_id(db, user_id=user_id, folder_id=folder_id)
-    for file_id in file_ids:
-        delete_file_and_index(db, user_id, file_id)
+# 커밋 후 정리 (BackgroundTasks 에서 실행)
+# 물리 파일을 지운 뒤, 삭제 비율이 높아진 폴더는 세그먼트를 압축한다.
+def cleanup_deleted(paths, tombstones):
+    unlink_paths(paths)
 
-    # 2. 자식 폴더 확인 -> 재귀 실행
-    child_folders_ids = find_all_child_folders_id(db, user_id=user_id, parent_folder_id=folder_id)
-    for child_folder_id in child_folders_ids:
-        delete_folder_recursive(db, user_id=user_id, folder_id=child_folder_id)
+    for vector_folder in tombstones:
+        try:
+            compact(vector_folder)
+        except OSError as e:
+            print(f"[SEGMENT] compaction failed for {vector_folder}: {e}")
+
+
+# 공통 삭제 함수: 파일들과 인덱스 벡터를 DB 에서 일괄 삭제하고,
+# 지워야 할 물리 파일(.enc, legacy .eiv) 경로와 tombstone 을 쓸 {인덱스 폴더: [index_id]} 를 반환
+# tombstone 은 commit_with_tombstones 에서 커밋과 함께, 물리 파일은 커밋 이후 cleanup_deleted 로 처리한다.
+def delete_files_and_indexes(db: Session, user_id: int, file_ids):
+    file_ids = list(file_ids)
+    paths = []
+    tombstones = {}
+    dict_ids = set()
+
+    for ids in chunked(file_ids):
+        # 1. 삭제할 인덱스 벡터 조회 (세그먼트 tombstone / legacy 파일 삭제를 위해)
+        index_rows = db.query(IndexVector.id, IndexVector.vector_path, IndexVector.dict_id).filter(
+            IndexVector.doc_id.in_(ids)
+        ).all()
+        for row in index_rows:
+            dict_ids.add(row.dict_id)
+            tombstones.setdefault(row.vector_path, []).append(row.id)
+            # 세그먼트 도입 이전 저장 경로 규칙: vector_path/{id}.eiv
+            paths.append(os.path.join(row.vector_path, f"{row.id}.eiv"))
+
+        # 2. DB에서 인덱스 벡터 먼저 삭제 (파일 삭제 시점에 외래키 걸림돌이 없도록)
+        db.query(IndexVector).filter(IndexVector.doc_id.in_(ids)).delete(synchronize_session=False)
+
+        # standing query 수신함에 남아 있는 해당 파일 결과도 삭제 (외래키)
+        db.query(StandingResult).filter(StandingResult.owner_id == user_id, StandingResult.file_id.in_(ids)).delete(
+            synchronize_session=False
+        )
+
+        # 3. 파일 DB 삭제
+        db.query(File).filter(File.owner_id == user_id, File.id.in_(ids)).delete(synchronize_session=False)
+
+    # 4. 실제 암호화 파일 경로
+    paths.extend(os.path.join(UPLOAD_FOLDER, f"user_{user_id}", f"{file_id}.enc") for file_id in file_ids)
+
+    # 5. 인덱스 집합이 바뀐 사전 버전의 generation 증가 (검색 결과 캐시 무효화, 커밋은 호출하는 쪽에서)
+    if dict_ids:
+        db.query(Dictionary).filter(Dictionary.owner_id == user_id, Dictionary.id.in_(dict_ids)).update(
+            {Dictionary.index_generation: Dictionary.index_generation + 1}, synchronize_session=False
+        )
+
+    # 6. 검색 시 사용하는 index_id -> doc_id 매핑 캐시 비우기
+    invalidate_index_map(user_id)
+    return paths, tombstones
 
-    # 3. 현재 폴더 DB 삭제
-    db.query(Folder).filter(Folder.owner_id == user_id, Folder.id == folder_id).delete(synchronize_session=False)
-    # 재귀 호출 중에는 commit을 하지 않고, 최상위 호출에서 한 번만 commit 하도록 설계되어 있음
-    # (아래 delete_item에서 commit 호출)
 
+def delete_file_and_index(db: Session, user_id: int, file_id: int):
+    return delete_files_and_indexes(db, user_id, [file_id])
 
-def find_all_child_folders_id(db: Session, user_id: int, parent_folder_id: int):
-    child_folders = db.query(Folder).filter(Folder.owner_id == user_id, Folder.parent_id == parent_folder_id).all()
-    return [folder.id for folder in child_folders]
 
+# 재귀 CTE 로 하위 폴더 전체를 (id, 깊이) 목록으로 한 번에 조회
+def find_subtree_folders(db: Session, user_id: int, folder_id: int):
+    subtree = select(Folder.id, literal_column("0").label("depth")).where(
+        Folder.owner_id == user_id, Folder.id == folder_id
+    ).cte(name="subtree", recursive=True)
+    subtree = subtree.union_all(
+        select(Folder.id, (subtree.c.depth + 1).label("depth")).where(
+            Folder.owner_id == user_id, Folder.parent_id == subtree.c.id
+        )
+    )
+    return db.execute(select(subtree.c.id, subtree.c.depth)).all()
 
-def find_all_files_id(db: Session, user_id: int, folder_id: int):
-    files = db.query(File).filter(File.owner_id == user_id, File.folder_id == folder_id).all()
-    return [file.id for file in files]
+
+def delete_folder_tree(db: Session, user_id: int, folder_id: int):
+    subtree = find_subtree_folders(db, user_id, folder_id)
+    if not subtree:
+        # 이미 삭제되었거나 없으면 스킵
+        return [], {}
+
+    folder_ids = [row.id for row in subtree]
+
+    # 1. 하위 폴더 전체에 속한 파일 일괄 삭제
+    file_ids = []
+    for ids in chunked(folder_ids):
+        file_ids.extend(row.id for row in db.query(File.id).filter(File.owner_id == user_id, File.folder_id.in_(ids)))
+    paths, tombstones = delete_files_and_indexes(db, user_id, file_ids)
+
+    # 2. 폴더 삭제: parent_id 외래키 때문에 가장 깊은 단계부터 단계별로 한 번씩
+    by_depth = {}
+    for row in subtree:
+        by_depth.setdefault(row.depth, []).append(row.id)
+    for depth in sorted(by_depth, reverse=True):
+        for ids in chunked(by_depth[depth]):
+            db.query(Folder).filter(Folder.owner_id == user_id, Folder.id.in_(ids)).delete(synchronize_session=False)
+
+    # commit 은 호출하는 쪽(delete_item)에서 한 번만
+    return paths, tombstones
 
 
 @router.post("/delete")
-def delete_item(body: DeleteRequest, db: Session = Depends(get_db), user: User = Depends(get_current_user)):
+def delete_item(body: DeleteRequest, background_tasks: BackgroundTasks, db: Session = Depends(get_db),
+                user: AuthUser = Depends(get_current_user)):
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
@@ -104,9 +173,10 @@ def delete_item(body: DeleteRequest, db: Session = Depends(get_db), user: User =
             raise HTTPException(status_code=404, detail="파일이 존재하지 않습니다.")
 
         # 공통 함수를 사용하여 인덱스 파일 삭제
-        delete_file_and_index(db, user.id, file_row.id)
+        paths, tombstones = delete_file_and_index(db, user.id, file_row.id)
 
-        db.commit()
+        commit_with_tombstones(db, tombstones)
+        background_tasks.add_task(cleanup_deleted, paths, tombstones)
         return {"message": "파일 삭제가 완료되었습니다."}
 
     elif body.type == "folder":
@@ -115,9 +185,11 @@ def delete_item(body: DeleteRequest, db: Session = Depends(get_db), user: User =
         if not folder_row:
             raise HTTPException(status_code=404, detail="폴더가 존재하지 않습니다.")
 
-        delete_folder_recursive(db, user_id=user.id, folder_id=folder_row.id)
+        paths, tombstones = delete_folder_tree(db, user_id=user.id, folder_id=folder_row.id)
 
-        db.commit()
+        commit_with_tombstones(db, tombstones)
+        # 물리 파일 / 압축은 커밋 후 응답을 보낸 뒤 처리
+        background_tasks.add_task(cleanup_deleted, paths, tombstones)
         return {"message": "폴더 삭제가 완료되었습니다."}
 
     else:
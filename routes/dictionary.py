@@ -1,11 +1,13 @@
 from typing import Optional, List
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Header, Response
+from fastapi.responses import FileResponse, StreamingResponse
 from pydantic import BaseModel
 from sqlalchemy.orm import Session
 
 from db import SessionLocal
-from models import Dictionary, User
-from dependencies.auth import get_current_user
+from models import Dictionary
+from dependencies.auth import get_current_user, AuthUser
+from utils.blob_store import blob_hash, find_blob, put_blob, read_blob, iter_blob, delete_blob, blob_lock
 from datetime import datetime
 
 router = APIRouter()
@@ -31,12 +33,14 @@ class DictEntry(BaseModel):
     poly_degree: int = 8192
     slot_count: int = 8192
     encoding: str = "BATCH"
+    # 검색 결과를 마지막 레벨로 mod switch (None 이면 기존 설정 유지, 새 사전은 False)
+    mod_switch: Optional[bool] = None
 
 class DictDownloadResponse(BaseModel):
     dictionaries: List[DictEntry]
 
 @router.post("/dict/download", response_model=DictDownloadResponse)
-def download_dict(body: DictDownloadRequest, db: Session = Depends(get_db), user: User = Depends(get_current_user)):
+def download_dict(body: DictDownloadRequest, db: Session = Depends(get_db), user: AuthUser = Depends(get_current_user)):
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
@@ -51,40 +55,198 @@ def download_dict(body: DictDownloadRequest, db: Session = Depends(get_db), user
     for result in results:
         entries.append(DictEntry(
             version = result.version,
-            enc_vocab = result.enc_vocab,
+            enc_vocab = read_blob(ensure_blob(db, result)),
             scheme = result.scheme,
             poly_degree = result.poly_degree,
             slot_count = result.slot_count,
             encoding = result.encoding,
+            mod_switch = result.mod_switch,
         ))
 
     return DictDownloadResponse(dictionaries=entries)
 
+# ----------------
+# 사전 manifest / 버전별 바이너리 다운로드
+# ----------------
+# 클라이언트는 manifest 의 content_hash 를 로컬 사본과 비교해 바뀐 버전만 /dict/{version}/raw 로 받는다.
+
+def ensure_blob(db: Session, dict_row: Dictionary) -> str:
+    """사전 데이터가 blob 저장소에 있는지 확인하고 content_hash 를 반환.
+
+    blob 저장소 도입 이전 행(enc_vocab 에 데이터가 남아 있는 행)은 이때 blob 으로 옮기고 enc_vocab 을 비운다.
+    """
+    if dict_row.content_hash and find_blob(dict_row.content_hash)[0] is not None:
+        return dict_row.content_hash
+
+    enc_vocab = dict_row.enc_vocab
+    if enc_vocab is None:
+        raise HTTPException(status_code=500, detail="사전 데이터 파일을 찾을 수 없습니다.")
+
+    content_hash = blob_hash(enc_vocab)
+    # 커밋까지 잠금 안에서 (release_blob 이 커밋 전의 참조를 못 보고 지우지 않도록)
+    with blob_lock([content_hash]):
+        dict_row.content_hash = put_blob(enc_vocab, content_hash)
+        dict_row.enc_vocab = None
+        db.commit()
+    return dict_row.content_hash
+
+
+def release_blob(db: Session, content_hash: Optional[str]):
+    # 더 이상 어떤 사전도 가리키지 않는 blob 만 삭제 (같은 내용은 사용자 간에도 공유될 수 있음)
+    if not content_hash:
+        return
+    # 새 참조는 blob_lock 안에서 커밋되므로, 잠금 안에서 확인한 결과는 삭제할 때까지 유효
+    with blob_lock([content_hash]):
+        db.commit()  # 이전 트랜잭션의 스냅샷이 아니라 최신 커밋을 보도록
+        if db.query(Dictionary.id).filter(Dictionary.content_hash == content_hash).first() is None:
+            delete_blob(content_hash)
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+@router.get("/dict/manifest")
+def dict_manifest(db: Session = Depends(get_db), user: AuthUser = Depends(get_current_user)):
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    # enc_vocab 은 읽지 않고 메타데이터만 조회
+    rows = db.query(
+        Dictionary.id, Dictionary.version, Dictionary.content_hash, Dictionary.scheme,
+        Dictionary.poly_degree, Dictionary.slot_count, Dictionary.encoding, Dictionary.mod_switch,
+        Dictionary.created_at
+    ).filter(Dictionary.owner_id == user.id).order_by(Dictionary.version).all()
+
+    missing = [row.id for row in rows if not row.content_hash]
+    backfilled = {}
+    if missing:
+        for dict_row in db.query(Dictionary).filter(Dictionary.id.in_(missing)).all():
+            backfilled[dict_row.id] = ensure_blob(db, dict_row)
+
+    return {
+        "dictionaries": [{
+            "version": row.version,
+            "content_hash": row.content_hash or backfilled.get(row.id),
+            "scheme": row.scheme,
+            "poly_degree": row.poly_degree,
+            "slot_count": row.slot_count,
+            "encoding": row.encoding,
+            "mod_switch": row.mod_switch,
+            "created_at": row.created_at,
+        } for row in rows]
+    }
+
+
+@router.get("/dict/{version}/raw")
+def download_dict_raw(version: int, if_none_match: Optional[str] = Header(None),
+                      accept_encoding: Optional[str] = Header(None),
+                      db: Session = Depends(get_db), user: AuthUser = Depends(get_current_user)):
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    # enc_vocab 은 deferred 라서 blob 저장소로 옮겨진 행은 메타데이터만 읽음
+    dict_row = db.query(Dictionary).filter(
+        Dictionary.owner_id == user.id, Dictionary.version == version
+    ).first()
+    if dict_row is None:
+        raise HTTPException(status_code=404, detail="사전을 찾을 수 없습니다.")
+
+    content_hash = ensure_blob(db, dict_row)
+    path, gzipped = find_blob(content_hash)
+    # gzip 으로 저장된 blob 은 클라이언트가 받을 수 있으면 압축된 그대로 보냄
+    send_gzip = gzipped and "gzip" in (accept_encoding or "")
+
+    # 본문 바이트가 다른 gzip 표현에는 별도 ETag. 응답이 Accept-Encoding 에 따라 달라지므로 304 에도 Vary
+    etag = f'"{content_hash}-gz"' if send_gzip else f'"{content_hash}"'
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache", "Vary": "Accept-Encoding"}
+
+    # 클라이언트 사본과 같으면 본문 없이 304
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+
+    if not gzipped:
+        # 파일에서 바로 전송 (메모리에 전체를 올리지 않음)
+        return FileResponse(path, media_type="application/octet-stream", headers=headers)
+
+    if send_gzip:
+        return FileResponse(path, media_type="application/octet-stream",
+                            headers={**headers, "Content-Encoding": "gzip"})
+    return StreamingResponse(iter_blob(path, gzipped), media_type="application/octet-stream", headers=headers)
+
+
 class DictUploadRequest(BaseModel):
     dictionaries: List[DictEntry]
 
 @router.post("/dict/upload")
-def upload_dict(body: DictUploadRequest, db: Session = Depends(get_db), user: User = Depends(get_current_user)):
+def upload_dict(body: DictUploadRequest, db: Session = Depends(get_db), user: AuthUser = Depends(get_current_user)):
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    replaced_hashes = []
+    content_hashes = [blob_hash(entry.enc_vocab) for entry in body.dictionaries]
+    # blob 쓰기부터 행 커밋까지 잠금 안에서 (같은 blob 을 release_blob 이 동시에 지우지 않도록)
+    with blob_lock(content_hashes):
+        for entry, content_hash in zip(body.dictionaries, content_hashes):
+            dict_row = db.query(Dictionary).filter(Dictionary.owner_id == user.id, Dictionary.version == entry.version).first()
+
+            # 기존 존재 사전 version -> update
+            if dict_row:
+                if entry.mod_switch is not None:
+                    dict_row.mod_switch = entry.mod_switch
+
+                # 내용이 같으면 hash 비교만으로 끝 (다시 쓰지 않음)
+                if dict_row.content_hash == content_hash and find_blob(content_hash)[0] is not None:
+                    continue
+
+                put_blob(entry.enc_vocab, content_hash)
+                if dict_row.content_hash != content_hash:
+                    replaced_hashes.append(dict_row.content_hash)
+                dict_row.content_hash = content_hash
+                dict_row.enc_vocab = None
+            else:
+                put_blob(entry.enc_vocab, content_hash)
+                new_dict = Dictionary(
+                    owner_id = user.id,
+                    version = entry.version,
+                    enc_vocab = None,
+                    content_hash = content_hash,
+                    scheme=entry.scheme,
+                    poly_degree=entry.poly_degree,
+                    slot_count=entry.slot_count,
+                    encoding=entry.encoding,
+                    mod_switch=bool(entry.mod_switch),
+                    created_at = datetime.utcnow(),
+                )
+                db.add(new_dict)
+
+        db.commit()
+
+    for old_hash in replaced_hashes:
+        release_blob(db, old_hash)
+
+
+# 사전별 검색 설정 변경 (사전 데이터를 다시 올리지 않고)
+class DictSettingsRequest(BaseModel):
+    version: int
+    mod_switch: bool
+
+@router.post("/dict/settings")
+def update_dict_settings(body: DictSettingsRequest, db: Session = Depends(get_db),
+                         user: AuthUser = Depends(get_current_user)):
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
-    for entry in body.dictionaries:
-        dict_row = db.query(Dictionary).filter(Dictionary.owner_id == user.id, Dictionary.version == entry.version).first()
-
-        # 기존 존재 사전 version -> update
-        if dict_row:
-            dict_row.enc_vocab = entry.enc_vocab
-        else:
-            new_dict = Dictionary(
-                owner_id = user.id,
-                version = entry.version,
-                enc_vocab = entry.enc_vocab,
-                scheme=entry.scheme,
-                poly_degree=entry.poly_degree,
-                slot_count=entry.slot_count,
-                encoding=entry.encoding,
-                created_at = datetime.utcnow(),
-            )
-            db.add(new_dict)
+    dict_row = db.query(Dictionary).filter(Dictionary.owner_id == user.id, Dictionary.version == body.version).first()
+    if dict_row is None:
+        raise HTTPException(status_code=404, detail="사전을 찾을 수 없습니다.")
 
+    dict_row.mod_switch = body.mod_switch
     db.commit()
+    return {"version": dict_row.version, "mod_switch": dict_row.mod_switch}
@@ -1,15 +1,23 @@
 from typing import List
-from fastapi import APIRouter, HTTPException, Depends, File, Form, UploadFile
+from fastapi import APIRouter, HTTPException, Depends, File, Form, UploadFile, BackgroundTasks
 from pydantic import BaseModel
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from starlette.responses import FileResponse
 
-from db import SessionLocal
+from db import SessionLocal, AsyncSessionLocal
 from models import File as FileModel
-from models import IndexVector, Dictionary, User, Folder
-from dependencies.auth import get_current_user
+from models import IndexVector, Dictionary, Folder
+from dependencies.auth import get_current_user, AuthUser
+from utils.index_map import invalidate_index_map
+from utils.folder_path import resolve_folder_path, path_ids
+from utils.upload import save_upload_file, temp_path_for, remove_quietly
+from utils.segment_store import append_vectors, write_tombstones
+from utils.standing import evaluate_standing_queries
+from settings import MAX_FILE_UPLOAD_BYTES, MAX_INDEX_VECTOR_BYTES
 from datetime import datetime
-import os, aiofiles, json, base64
+import os, json, base64, asyncio
 
 router = APIRouter()
 
@@ -52,74 +60,132 @@ def get_db():
         db.close()
 
 
+# async 라우트용 (이벤트 루프를 막지 않음)
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
 @router.post("/file/upload")
 async def upload_file(
+        background_tasks: BackgroundTasks,
         form: UploadRequest = Depends(UploadRequest.as_form),
         enc_file: UploadFile = File(...),
         index_vectors: List[UploadFile] = File(...),
-        db: Session = Depends(get_db),
-        user: User = Depends(get_current_user),
+        db: AsyncSession = Depends(get_async_db),
+        user: AuthUser = Depends(get_current_user),
 ):
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
-    # 파일 경로 생성 / 검색
-    user_folder = os.path.join(UPLOAD_FOLDER, f"user_{user.id}")
-    os.makedirs(user_folder, exist_ok=True)
-
-    # [수정] folder_id가 0(루트)이면 DB에는 NULL(None)로 저장해야 함
-    folder_id = form.folder_id if form.folder_id != 0 else None
-
-    file_record = FileModel(
-        owner_id=user.id,
-        folder_id=folder_id,  # 수정된 변수 사용
-        cipher_title=form.cipher_title,
-        mime=form.mime,
-        uploaded_at=datetime.utcnow(),
-        file_path=user_folder,
-    )
-    db.add(file_record)
-    db.commit()
-    db.refresh(file_record)  # 파일 고유 아이디값 생성
+    # 1. 검증 (파일을 쓰기 전에 먼저)
+    if len(form.dict_version_list) != len(index_vectors):
+        raise HTTPException(status_code=400, detail="사전 정보와 인덱스 벡터 정보가 불일치합니다. 개수 정보 오류")
 
-    # 파일명 확정 및 최종 파일 경로
-    file_path = os.path.join(user_folder, f"{file_record.id}.enc")
+    # 사전 버전들을 IN 쿼리 한 번으로 조회
+    versions = set(form.dict_version_list)
+    result = await db.execute(select(Dictionary).filter(Dictionary.owner_id == user.id, Dictionary.version.in_(versions)))
+    dict_ids = {dict_row.version: dict_row.id for dict_row in result.scalars()}
+    if versions - dict_ids.keys():
+        raise HTTPException(status_code=404, detail="사전 정보가 없습니다.")
 
-    # 파일 업로드
-    async with aiofiles.open(file_path, mode="wb") as f:
-        uploaded_data = await enc_file.read()
-        await f.write(uploaded_data)
+    # 조회 트랜잭션 종료 (업로드를 받는 동안 DB 커넥션을 잡고 있지 않도록)
+    await db.commit()
 
-    # 인덱스
-    if len(form.dict_version_list) != len(index_vectors):
-        raise HTTPException(status_code=400, detail="사전 정보와 인덱스 벡터 정보가 불일치합니다. 개수 정보 오류")
+    # 파일 경로 생성 / 검색
+    user_folder = os.path.join(UPLOAD_FOLDER, f"user_{user.id}")
+    os.makedirs(user_folder, exist_ok=True)
 
-    for version, index_vector in zip(form.dict_version_list, index_vectors):
+    vector_folders = []
+    for version in form.dict_version_list:
         # 인덱스 벡터 저장 경로
         vector_folder = os.path.join(UPLOAD_FOLDER, "index", f"user_{user.id}", f"dict_{version}")
         os.makedirs(vector_folder, exist_ok=True)
+        vector_folders.append(vector_folder)
 
-        # 해당 사전 정보 찾기
-        dict_row = db.query(Dictionary).filter(Dictionary.owner_id == user.id, Dictionary.version == version).first()
-        if not dict_row:
-            raise HTTPException(status_code=404, detail="사전 정보가 없습니다.")
+    # 2. 업로드 내용을 최종 폴더 안의 임시 파일로 받아둠 (DB 트랜잭션을 길게 잡지 않기 위해)
+    staged_paths = []
+    final_paths = []
+    appended = []  # 세그먼트에 이미 추가한 (폴더, index_id 목록). 실패 시 tombstone 처리
+    try:
+        staged_file = temp_path_for(os.path.join(user_folder, "upload"))
+        staged_paths.append(staged_file)
+        await save_upload_file(enc_file, staged_file, MAX_FILE_UPLOAD_BYTES)
+
+        staged_vectors = []
+        for vector_folder, index_vector in zip(vector_folders, index_vectors):
+            staged_vector = temp_path_for(os.path.join(vector_folder, "upload"))
+            staged_paths.append(staged_vector)
+            await save_upload_file(index_vector, staged_vector, MAX_INDEX_VECTOR_BYTES)
+            staged_vectors.append(staged_vector)
+
+        # 3. File / IndexVector 를 한 트랜잭션으로 추가
+        # [수정] folder_id가 0(루트)이면 DB에는 NULL(None)로 저장해야 함
+        folder_id = form.folder_id if form.folder_id != 0 else None
+
+        file_record = FileModel(
+            owner_id=user.id,
+            folder_id=folder_id,  # 수정된 변수 사용
+            cipher_title=form.cipher_title,
+            mime=form.mime,
+            uploaded_at=datetime.utcnow(),
+            file_path=user_folder,
+        )
+        db.add(file_record)
+        await db.flush()  # 파일 고유 아이디값 생성 (커밋은 마지막에 한 번)
 
-        index_record = IndexVector(
+        index_records = [IndexVector(
             owner_id=user.id,
             doc_id=file_record.id,
-            dict_id=dict_row.id,
+            dict_id=dict_ids[version],
             vector_path=vector_folder,
-        )
-        db.add(index_record)
-        db.commit()
-        db.refresh(index_record)
-
-        # 인덱스 벡터명 확정 및 최종 인덱스 벡터 경로
-        vector_path = os.path.join(vector_folder, f"{index_record.id}.eiv")  # encrypted index vector
-
-        async with aiofiles.open(vector_path, mode="wb") as f:
-            vector_data = await index_vector.read()
-            await f.write(vector_data)
+        ) for version, vector_folder in zip(form.dict_version_list, vector_folders)]
+        db.add_all(index_records)
+        await db.flush()
+
+        # 인덱스 집합이 바뀌었으므로 이 사전 버전들의 검색 결과 캐시 무효화 (같은 트랜잭션에서 증가)
+        await db.execute(update(Dictionary).where(Dictionary.id.in_(set(dict_ids.values()))).values(
+            index_generation=Dictionary.index_generation + 1
+        ))
+
+        # 4. 파일명 확정 후 임시 파일을 최종 경로로 rename
+        file_path = os.path.join(user_folder, f"{file_record.id}.enc")
+        os.replace(staged_file, file_path)
+        final_paths.append(file_path)
+
+        # 인덱스 벡터는 문서별 파일 대신 사전 버전 폴더의 세그먼트에 이어 붙임 (vector_path/segment_N.seg)
+        by_folder = {}
+        for index_record, staged_vector in zip(index_records, staged_vectors):
+            by_folder.setdefault(index_record.vector_path, []).append((index_record.id, staged_vector))
+        for vector_folder, items in by_folder.items():
+            # 폴더 잠금(flock)을 기다릴 수 있으므로 스레드에서 실행
+            await asyncio.to_thread(append_vectors, vector_folder, items)
+            appended.append((vector_folder, [index_id for index_id, _ in items]))
+
+        await db.commit()
+    except BaseException:
+        # 보상 처리: DB 롤백 + 이미 쓴 파일 제거 + 세그먼트에 추가한 벡터는 tombstone (고아 행/파일을 남기지 않음)
+        await db.rollback()
+        for vector_folder, index_ids in appended:
+            # append 와 같이 폴더 잠금(flock)을 기다릴 수 있으므로 스레드에서 실행
+            await asyncio.to_thread(write_tombstones, vector_folder, index_ids)
+        for path in staged_paths + final_paths:
+            remove_quietly(path)
+        raise
+
+    # 세그먼트로 복사가 끝난 임시 파일 정리
+    for path in staged_vectors:
+        remove_quietly(path)
+
+    # 검색 시 사용하는 index_id -> doc_id 매핑 캐시 갱신
+    for version in versions:
+        invalidate_index_map(user.id, version)
+
+    # 등록된 standing query 를 이번에 추가된 인덱스 벡터에 대해서만 평가 (응답을 보낸 뒤 실행)
+    background_tasks.add_task(evaluate_standing_queries, user.id, [
+        (index_record.dict_id, index_record.vector_path, index_record.id, file_record.id)
+        for index_record in index_records
+    ])
 
     return {"status": "success"}
 
@@ -131,7 +197,7 @@ class FileDownloadRequest(BaseModel):
 
 @router.post("/file/download")
 def download_file(body: FileDownloadRequest, db: Session = Depends(get_db),
-                  user: User = Depends(get_current_user)):
+                  user: AuthUser = Depends(get_current_user)):
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
@@ -152,53 +218,53 @@ def download_file(body: FileDownloadRequest, db: Session = Depends(get_db),
 
 
 # 파일 검색
-def build_folder_path(db: Session, folder_id: int, user_id: int):
-    path_parts = []
+def build_folder_path(db: Session, folder_id: int, user_id: int, folder_path: str = None):
+    root = {
+        "folder_id": 0,
+        "folder_enc_name": None,
+    }
 
     # folder_id가 0이거나 None이면 바로 루트 반환
     if folder_id == 0 or folder_id is None:
-        return [{
-            "folder_id": 0,
-            "folder_enc_name": None,
-        }]
-
-    current = db.query(Folder).filter(Folder.owner_id == user_id, Folder.id == folder_id).first()
-
-    if not current:
-        return [{
-            "folder_id": 0,
-            "folder_enc_name": None,
-        }]
-
-    while current:
-        path_parts.append({
-            "folder_id": current.id,
-            "folder_enc_name": current.enc_name,
-        })
-        if current.parent_id == 0 or current.parent_id is None:
+        return [root]
+
+    if not folder_path:
+        current = db.query(Folder).filter(Folder.owner_id == user_id, Folder.id == folder_id).first()
+        if not current:
+            return [root]
+        folder_path = resolve_folder_path(db, current)
+
+    # 조상 폴더 전체를 한 번의 쿼리로 조회 (단계별 조회 X)
+    ancestor_ids = path_ids(folder_path)
+    ancestors = db.query(Folder.id, Folder.enc_name).filter(Folder.owner_id == user_id, Folder.id.in_(ancestor_ids)).all()
+    enc_names = {ancestor.id: ancestor.enc_name for ancestor in ancestors}
+
+    path_parts = [root]
+    for ancestor_id in ancestor_ids:
+        if ancestor_id in enc_names:
             path_parts.append({
-                "folder_id": 0,
-                "folder_enc_name": None,
+                "folder_id": ancestor_id,
+                "folder_enc_name": enc_names[ancestor_id],
             })
-            break
-        current = db.query(Folder).filter(Folder.owner_id == user_id, Folder.id == current.parent_id).first()
-
-    path_parts.reverse()
     return path_parts
 
 
 @router.post("/file/{id}")
-def get_file_info(id: int, db: Session = Depends(get_db), user: User = Depends(get_current_user)):
+def get_file_info(id: int, db: Session = Depends(get_db), user: AuthUser = Depends(get_current_user)):
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
-    file_row = db.query(FileModel).filter(FileModel.owner_id == user.id, FileModel.id == id).first()
-    if not file_row:
+    # 파일과 상위 폴더 경로를 함께 조회
+    row = db.query(FileModel, Folder.path).outerjoin(Folder, FileModel.folder_id == Folder.id).filter(
+        FileModel.owner_id == user.id, FileModel.id == id
+    ).first()
+    if not row:
         raise HTTPException(status_code=404, detail="파일이 존재하지 않습니다.")
+    file_row, folder_path = row
 
     # folder_id가 None일 수 있으므로 0으로 변환해서 전달하거나 그대로 전달
     folder_id = file_row.folder_id if file_row.folder_id is not None else 0
-    paths = build_folder_path(db, folder_id, user.id)
+    paths = build_folder_path(db, folder_id, user.id, folder_path)
 
     return {
         "file_id": file_row.id,
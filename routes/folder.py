@@ -1,11 +1,15 @@
+import base64
+import json
 from typing import Optional
 from fastapi import APIRouter, HTTPException, Depends, File
 from pydantic import BaseModel
 from sqlalchemy.orm import Session
 
 from db import SessionLocal
-from models import File, User, Folder
-from dependencies.auth import get_current_user
+from models import File, Folder
+from dependencies.auth import get_current_user, AuthUser
+from utils.folder_path import resolve_folder_path, child_path
+from settings import FOLDER_PAGE_DEFAULT_LIMIT, FOLDER_PAGE_MAX_LIMIT
 from datetime import datetime
 
 router = APIRouter()
@@ -44,7 +48,7 @@ def build_folder_response(folder_id, folders, files):
 
 
 @router.post("/folder/list")
-def folder_lookup(body: FolderSearchRequest, db: Session = Depends(get_db), user: User = Depends(get_current_user)):
+def folder_lookup(body: FolderSearchRequest, db: Session = Depends(get_db), user: AuthUser = Depends(get_current_user)):
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
@@ -62,25 +66,107 @@ def folder_lookup(body: FolderSearchRequest, db: Session = Depends(get_db), user
         return build_folder_response(body.folder_id, folders, files)
 
 
+# ----------------
+# 폴더 조회 (키셋 페이지네이션)
+# ----------------
+# 하위 폴더를 id 순으로 모두 돌려준 뒤 파일을 id 순으로 이어서 돌려준다.
+# cursor 는 마지막으로 보낸 항목의 (종류, id) 를 base64 로 감싼 값이며, 클라이언트는 그대로 다시 보내기만 한다.
+class FolderPageRequest(BaseModel):
+    folder_id: int
+    cursor: Optional[str] = None
+    limit: Optional[int] = None
+
+
+def encode_cursor(kind: str, last_id: int) -> str:
+    raw = json.dumps({"k": kind, "id": last_id}, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        data = json.loads(raw)
+        kind, last_id = data["k"], int(data["id"])
+    except Exception:
+        raise HTTPException(status_code=400, detail="잘못된 cursor 입니다.")
+    if kind not in ("folder", "file"):
+        raise HTTPException(status_code=400, detail="잘못된 cursor 입니다.")
+    return kind, last_id
+
+
+@router.post("/folder/list/page")
+def folder_lookup_page(body: FolderPageRequest, db: Session = Depends(get_db),
+                       user: AuthUser = Depends(get_current_user)):
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    limit = body.limit or FOLDER_PAGE_DEFAULT_LIMIT
+    if limit < 1:
+        raise HTTPException(status_code=400, detail="limit 은 1 이상이어야 합니다.")
+    limit = min(limit, FOLDER_PAGE_MAX_LIMIT)
+
+    kind, last_id = decode_cursor(body.cursor) if body.cursor else ("folder", 0)
+
+    # folder_id 0 은 루트 (parent_id / folder_id 가 NULL)
+    if body.folder_id == 0:
+        folder_cond = Folder.parent_id.is_(None)
+        file_cond = File.folder_id.is_(None)
+    else:
+        folder_cond = Folder.parent_id == body.folder_id
+        file_cond = File.folder_id == body.folder_id
+
+    # (owner_id, parent_id, id) / (owner_id, folder_id, id) 인덱스를 타도록 id 범위 + 정렬 + limit
+    # 다음 페이지가 있는지 알기 위해 한 개씩 더 조회
+    folders = []
+    if kind == "folder":
+        folders = db.query(Folder).filter(
+            Folder.owner_id == user.id, folder_cond, Folder.id > last_id
+        ).order_by(Folder.id).limit(limit + 1).all()
+
+        if len(folders) > limit:
+            folders = folders[:limit]
+            response = build_folder_response(body.folder_id, folders, [])
+            response["next_cursor"] = encode_cursor("folder", folders[-1].id)
+            return response
+        last_id = 0
+
+    remaining = limit - len(folders)
+    files = db.query(File).filter(
+        File.owner_id == user.id, file_cond, File.id > last_id
+    ).order_by(File.id).limit(remaining + 1).all()
+
+    next_cursor = None
+    if len(files) > remaining:
+        files = files[:remaining]
+        # 폴더만으로 페이지가 꽉 찬 경우 다음 페이지는 첫 파일부터
+        next_cursor = encode_cursor("file", files[-1].id if files else 0)
+
+    response = build_folder_response(body.folder_id, folders, files)
+    response["next_cursor"] = next_cursor
+    return response
+
+
 class FolderCreateRequest(BaseModel):
     enc_title: str
     parent_folder_id: Optional[int] = None
 
 
 @router.post("/folder/create")
-def create_folder(body: FolderCreateRequest, db: Session = Depends(get_db), user: User = Depends(get_current_user)):
+def create_folder(body: FolderCreateRequest, db: Session = Depends(get_db), user: AuthUser = Depends(get_current_user)):
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
     print("부모 폴더 ID 요청값: " + str(body.parent_folder_id))
 
     parent_folder_id = None
+    parent_path = None
 
     if body.parent_folder_id is not None and body.parent_folder_id != 0:
         parent_folder = db.query(Folder).filter(Folder.id == body.parent_folder_id, Folder.owner_id == user.id).first()
         if not parent_folder:
             raise HTTPException(status_code=404, detail="부모 폴더가 존재하지 않습니다.")
         parent_folder_id = body.parent_folder_id
+        parent_path = resolve_folder_path(db, parent_folder)
 
     new_folder = Folder(
         owner_id=user.id,
@@ -90,6 +176,8 @@ def create_folder(body: FolderCreateRequest, db: Session = Depends(get_db), user
     )
 
     db.add(new_folder)
+    db.flush()  # id 확정 후 조상 경로 기록
+    new_folder.path = child_path(parent_path, new_folder.id)
     db.commit()
     db.refresh(new_folder)
 
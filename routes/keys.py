@@ -1,28 +1,28 @@
-from fastapi import APIRouter, Depends, UploadFile, File, HTTPException
-from sqlalchemy.orm import Session
-from db import SessionLocal
+from fastapi import APIRouter, Depends, UploadFile, File
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import AsyncSession
+from db import AsyncSessionLocal
 from models import User
-from dependencies.auth import get_current_user
+from dependencies.auth import get_current_user, invalidate_user, AuthUser
+from utils.engine_pool import engine_pool
+from utils.upload import save_upload_file, temp_path_for, remove_quietly
+from settings import MAX_EVAL_KEY_BYTES
 import os
-import aiofiles
 
 router = APIRouter()
 
 UPLOAD_FOLDER = "uploads"
 
-def get_db():
-    db = SessionLocal()
-    try:
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
 
 @router.post("/keys/upload")
 async def upload_eval_keys(
     relin_key: UploadFile = File(...),
     galois_key: UploadFile = File(...),
-    db: Session = Depends(get_db),
-    user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    user: AuthUser = Depends(get_current_user)
 ):
     # 1. 저장 경로 설정: uploads/keys/user_{id}/
     user_key_dir = os.path.join(UPLOAD_FOLDER, "keys", f"user_{user.id}")
@@ -30,20 +30,33 @@ async def upload_eval_keys(
 
     print(f"[INFO] 키 업로드 요청 받음: User {user.id}")  # 디버깅용 로그
 
-    # 2. RelinKey 저장
     relin_path = os.path.join(user_key_dir, "relin_keys.k")
-    async with aiofiles.open(relin_path, 'wb') as f:
-        content = await relin_key.read()
-        await f.write(content)
-
-    # 3. GaloisKey 저장
     gal_path = os.path.join(user_key_dir, "gal_keys.k")
-    async with aiofiles.open(gal_path, 'wb') as f:
-        content = await galois_key.read()
-        await f.write(content)
 
-    # 4. DB 상태 업데이트
-    user.has_eval_keys = True
-    db.commit()
+    # 두 키를 모두 받은 뒤에 교체해야 relin/galois 키가 서로 다른 세대로 섞이지 않음
+    relin_staged = temp_path_for(relin_path)
+    gal_staged = temp_path_for(gal_path)
+    try:
+        # 2. RelinKey 저장
+        await save_upload_file(relin_key, relin_staged, MAX_EVAL_KEY_BYTES)
+
+        # 3. GaloisKey 저장
+        await save_upload_file(galois_key, gal_staged, MAX_EVAL_KEY_BYTES)
+
+        os.replace(relin_staged, relin_path)
+        os.replace(gal_staged, gal_path)
+    finally:
+        remove_quietly(relin_staged)
+        remove_quietly(gal_staged)
+
+    # 상주 검색 엔진이 들고 있는 이전 키 폐기
+    engine_pool.invalidate_keys(user_key_dir)
+
+    # 4. DB 상태 업데이트 (user 는 인증 단계의 세션에서 읽은 객체이므로 UPDATE 로 직접 반영)
+    await db.execute(update(User).where(User.id == user.id).values(has_eval_keys=True))
+    await db.commit()
+
+    # has_eval_keys 가 바뀌었으므로 인증 캐시도 갱신
+    invalidate_user(user.id)
 
     return {"message": "연산 키(Evaluation Keys) 업로드가 완료되었습니다."}
\ No newline at end of file
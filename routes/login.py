@@ -1,20 +1,17 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel, EmailStr
 from utils.token import create_access_token
-from db import SessionLocal
+from utils.password import argon2_pool
+from db import AsyncSessionLocal
 from models import User
-import base64
-from argon2.low_level import hash_secret_raw, Type
 
 router = APIRouter()
 
-def get_db():
-    db = SessionLocal()
-    try:
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
 
 class LoginRequest(BaseModel):
     email: EmailStr
@@ -32,25 +29,26 @@ class LoginResponse(BaseModel):
     pk: str
 
 @router.post("/login", response_model=LoginResponse)
-def login(body: LoginRequest, db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.email == body.email).first()
+async def login(body: LoginRequest, db: AsyncSession = Depends(get_async_db)):
+    result = await db.execute(select(User).filter(User.email == body.email))
+    user = result.scalars().first()
 
     if not user:
         raise HTTPException(status_code=404, detail="User Not Found")
     if user.status != "verified":
         raise HTTPException(status_code=403, detail="User Not Verified")
 
-    salt = base64.b64decode(user.salt)
+    # 해시 계산을 기다리는 동안 DB 커넥션을 잡고 있지 않도록 반납
+    await db.close()
 
-    calc_verifier = base64.b64encode(hash_secret_raw(
-        body.password.encode(),
-        salt,
+    # Argon2 (64 MiB, time 3) 계산은 전용 프로세스 풀에서 실행 (대기열이 가득 차면 503)
+    calc_verifier = await argon2_pool.compute_verifier(
+        body.password,
+        user.salt,
         user.argon_time,
         user.argon_mem,
         user.argon_parallel,
-        32,
-        Type.ID
-    )).decode()
+    )
 
     if calc_verifier != user.pw_verifier:
         raise HTTPException(status_code=401, detail="비밀번호가 일치하지 않습니다.")
@@ -0,0 +1,32 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from dependencies.auth import auth_cache
+from utils.engine_pool import engine_pool
+from utils.index_map import cache_size as index_map_cache_size
+from utils.metrics import REGISTRY, CallbackGauge
+from utils.password import argon2_pool
+from utils.result_cache import result_cache
+from utils.standing import standing_hub
+
+router = APIRouter()
+
+# ----------------
+# 캐시 / 풀 상태 (수집 시점에 읽음)
+# ----------------
+
+CallbackGauge("he_auth_cache", "Authentication cache size and hit/miss counts",
+              lambda: {(key,): value for key, value in auth_cache.stats().items()}, labels=("stat",))
+CallbackGauge("he_argon2_pool", "Argon2 process pool state",
+              lambda: {(key,): value for key, value in argon2_pool.stats().items()}, labels=("stat",))
+CallbackGauge("he_engine_pool", "Search engine pool workers",
+              lambda: {(key,): value for key, value in engine_pool.stats().items()}, labels=("stat",))
+CallbackGauge("he_result_cache", "Search result cache size",
+              lambda: {(key,): value for key, value in result_cache.stats().items()}, labels=("stat",))
+CallbackGauge("he_standing_connections", "Connected standing query websockets", standing_hub.connection_count)
+CallbackGauge("he_index_map_cache_entries", "Cached index_id -> doc_id maps", index_map_cache_size)
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
@@ -1,10 +1,13 @@
 from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from db import SessionLocal
+from db import SessionLocal, AsyncSessionLocal
 from pydantic import EmailStr, BaseModel
 from models import User
+from dependencies.auth import invalidate_user
+from utils.password import argon2_pool
 import secrets
-from argon2.low_level import hash_secret_raw, Type
 import base64
 
 router = APIRouter()
@@ -16,6 +19,10 @@ def get_db():
     finally:
         db.close()
 
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
 # ---------------------------
 # 1) 사용자 이메일 확인 및 PK 등록
 # ---------------------------
@@ -86,28 +93,33 @@ class RegisterCompleteRequest(BaseModel):
     enc_mk: str
 
 @router.post("/complete")
-def register_complete(body: RegisterCompleteRequest, db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.email == body.email).first()
+async def register_complete(body: RegisterCompleteRequest, db: AsyncSession = Depends(get_async_db)):
+    result = await db.execute(select(User).filter(User.email == body.email))
+    user = result.scalars().first()
     if not user:
         raise HTTPException(status_code=400, detail="User not found")
 
-    salt = base64.b64decode(user.salt)
+    # 해시 계산을 기다리는 동안 DB 커넥션을 잡고 있지 않도록 반납
+    await db.close()
 
-    pw_verifier = base64.b64encode(hash_secret_raw(
-        body.password.encode(),
-        salt,
+    # Argon2 계산은 전용 프로세스 풀에서 실행 (대기열이 가득 차면 503)
+    pw_verifier = await argon2_pool.compute_verifier(
+        body.password,
+        user.salt,
         user.argon_time,
         user.argon_mem,
         user.argon_parallel,
-        32,
-        Type.ID
-    )).decode()
+    )
 
     user.enc_sk = body.enc_sk
     user.enc_mk = body.enc_mk
     user.pw_verifier = pw_verifier
     user.status = "verified"
 
-    db.commit()
+    db.add(user)
+    await db.commit()
+
+    # 계정 정보가 바뀌었으므로 인증 캐시에서 제거
+    invalidate_user(user.id)
 
     return {"message" : "회원가입이 성공적으로 완료되었습니다."}
\ No newline at end of file
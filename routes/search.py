@@ -2,21 +2,42 @@ import asyncio
 from typing import List
 from fastapi import APIRouter, HTTPException, Depends, WebSocket, UploadFile, Form, File
 
-from db import SessionLocal
-from models import IndexVector, User, Dictionary
-from dependencies.auth import get_current_user
-import os, aiofiles, json, uuid, sys
+from sqlalchemy import select
+
+from db import AsyncSessionLocal
+from models import Dictionary
+from dependencies.auth import get_current_user, AuthUser
+from utils.engine_pool import engine_pool
+from utils.index_map import load_index_map, lookup_doc_id
+from utils.upload import save_upload_file
+from utils.metrics import SEARCH_STAGE_SECONDS, SEARCH_BYTES_SENT, SEARCH_VECTORS_SCANNED, SEARCH_JOBS, \
+    SEARCH_RESULT_CACHE, SEARCH_RESULT_RAW_BYTES, SEARCH_RESULT_PAYLOAD_BYTES
+from utils.result_cache import result_cache, query_digest, CachedResults
+from utils.query_spool import write_spool_file, remove_spool_files
+from settings import SEARCH_JOB_CONCURRENCY, SEARCH_SEND_QUEUE_SIZE, MAX_QUERY_BYTES, RESULT_CACHE_BYTES, \
+    ENGINE_THREADS, SEARCH_QUERIES_PER_PASS, SEARCH_COMPRESSION_MODES, SEARCH_DEFLATE_LEVEL, SEARCH_MAX_INLINE_QUERIES
+import os, aiofiles, json, uuid, sys, struct, time, hashlib, base64, zlib
 
 router = APIRouter()
 # [주의] Docker 환경 변수나 설정에 맞춰 경로 확인 필요
 UPLOAD_FOLDER = "uploads"
 # 만약 Docker 내부 절대 경로라면 '/app/uploads', 로컬 테스트면 'uploads'
 
+# 바이너리 결과 프레임 헤더: job_id(uint32), file_id(int64), 암호문 길이(uint32), little endian
+# 헤더 뒤에 직렬화된 결과 암호문 바이트가 그대로 붙는다. (에러 / 종료 메시지는 기존처럼 JSON 텍스트 프레임)
+RESULT_FRAME_HEADER = struct.Struct("<IqI")
+# packed 결과 프레임 헤더: job_id(uint32), 슬롯 수 n(uint32), 암호문 길이(uint32)
+# 헤더 뒤에 슬롯 순서의 file_id n 개(int64, 매핑되지 않은 슬롯은 -1), 그 뒤에 결과 암호문 바이트
+PACKED_FRAME_HEADER = struct.Struct("<III")
+# packed 세션의 바이너리 결과는 모두 PACKED_FRAME_HEADER 프레임이다. (RESULT_FRAME_HEADER 와 섞이지 않음)
+# 슬롯 마스크 곱셈에 노이즈 여유가 필요해서 이보다 작은 poly_degree 사전은 packed 세션에서 작업 에러로 거절
+PACKED_MIN_POLY_DEGREE = 8192
+
 @router.post("/upload/queries")
 async def upload_queries(
         dict_versions: str = Form(...),
         queries: List[UploadFile] = File(...),
-        user: User = Depends(get_current_user)
+        user: AuthUser = Depends(get_current_user)
 ):
     if not user:
         raise HTTPException(status_code=404, detail="User not found.")
@@ -40,9 +61,7 @@ async def upload_queries(
         qid = str(uuid.uuid4())
 
         save_path = os.path.join(user_query_dir, f"{qid}.eiv")
-        async with aiofiles.open(save_path, mode="wb") as f:
-            query_vector = await query.read()
-            await f.write(query_vector)
+        await save_upload_file(query, save_path, MAX_QUERY_BYTES)
 
         result_ids.append(qid)
 
@@ -64,7 +83,7 @@ async def search_stream(websocket: WebSocket):
         return
 
     try:
-        user = get_current_user(token)
+        user = await get_current_user(token)
     except Exception:
         await websocket.close(code=4001, reason="토큰이 유효하지 않습니다.")
         return
@@ -77,10 +96,20 @@ async def search_stream(websocket: WebSocket):
     try:
         body = await websocket.receive_json()
 
+        binary = False
+        compression = None
+        packed = False
         if isinstance(body, list):
             items = body
         elif isinstance(body, dict):
             items = body.get("items", [])
+            # {"items": [...], "binary": true} 면 결과를 바이너리 프레임으로 전송
+            binary = bool(body.get("binary", False))
+            # {"packed": true} 면 문서 점수들을 슬롯별로 묶은 결과 암호문 + 슬롯 -> file_id 목록으로 전송
+            packed = bool(body.get("packed", False))
+            # {"compression": ["zstd", "deflate", ...]} 면 클라이언트 선호 순서대로 서버가 허용하는 방식을 하나 고름
+            if "compression" in body:
+                compression = negotiate_compression(body["compression"])
         else:
             items = []
 
@@ -89,124 +118,374 @@ async def search_stream(websocket: WebSocket):
         await websocket.close(code=4002, reason="JSON 파싱 오류")
         return
 
-    db = SessionLocal()
+    # 압축을 요청한 클라이언트에게만 결정된 방식을 먼저 알림 (zstd / zlib 은 SEAL 의 Ciphertext::load 가 그대로 풀고,
+    # deflate 는 결과 바이트를 zlib 으로 푼 뒤 load)
+    if compression is not None:
+        await websocket.send_json({"status": "start", "compression": compression})
+
+    # {"dict_version": v, "inline": true} 항목은 /upload/queries 없이 JSON 다음에
+    # 항목 순서대로 쿼리 암호문을 바이너리 프레임 하나씩으로 받음
+    # 프레임은 받는 즉시 메모리 기반 spool 에 써서 세션이 쿼리들을 메모리에 들고 있지 않도록 함
+    if sum(1 for entity in items if entity.get("inline")) > SEARCH_MAX_INLINE_QUERIES:
+        await websocket.close(code=4003, reason="inline 쿼리 개수 초과")
+        return
+
+    inline_queries = {}  # job_id -> (spool 경로, 쿼리 sha256)
+    # 세션이 끝나면 지울 spool 파일
+    spool_paths = []
+    try:
+        for job_id, entity in enumerate(items):
+            if not entity.get("inline"):
+                continue
+            data = await websocket.receive_bytes()
+            if len(data) > MAX_QUERY_BYTES:
+                remove_spool_files(spool_paths)
+                await websocket.close(code=4003, reason="쿼리 크기 초과")
+                return
+            query_path, digest = await asyncio.to_thread(spool_inline_query, data)
+            spool_paths.append(query_path)
+            inline_queries[job_id] = (query_path, digest)
+    except Exception as e:
+        print(f"WebSocket Query Frame Error: {e}")
+        remove_spool_files(spool_paths)
+        await websocket.close(code=4002, reason="쿼리 프레임 오류")
+        return
+
+    setup_start = time.perf_counter()
+
+    # 요청에 포함된 사전 버전을 한 번에 조회
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(select(Dictionary).filter(
+            Dictionary.owner_id == user.id,
+            Dictionary.version.in_({entity["dict_version"] for entity in items})
+        ))
+        dict_rows = {dict_row.version: dict_row for dict_row in result.scalars()}
 
     # 쿼리 작업 목록 구성
     query_jobs = []
 
-    for entity in items:  # body 대신 items 순회
+    for job_id, entity in enumerate(items):  # body 대신 items 순회
         dict_version = entity["dict_version"]
-        qid = entity["query_id"]
+        qid = entity.get("query_id")
 
-        dict_row = db.query(Dictionary).filter(Dictionary.owner_id == user.id,
-                                               Dictionary.version == dict_version).first()
+        dict_row = dict_rows.get(dict_version)
         if not dict_row:
-            await websocket.send_json({"error": f"사전 버전 {dict_version}을 찾을 수 없습니다."})
+            await websocket.send_json({"job_id": job_id, "error": f"사전 버전 {dict_version}을 찾을 수 없습니다."})
             continue
 
-        keys_path = os.path.join(UPLOAD_FOLDER, "keys", f"user_{user.id}")
+        if packed and dict_row.poly_degree < PACKED_MIN_POLY_DEGREE:
+            await websocket.send_json({"job_id": job_id,
+                                       "error": f"packed 결과는 poly_degree {PACKED_MIN_POLY_DEGREE} 이상 사전만 지원합니다."})
+            continue
 
-        # 쿼리 파일 경로
-        query_path = os.path.join(UPLOAD_FOLDER, "query", f"user_{user.id}", f"{qid}.eiv")
+        keys_path = os.path.join(UPLOAD_FOLDER, "keys", f"user_{user.id}")
 
         # 인덱스 벡터 폴더 경로
         vector_folder = os.path.join(UPLOAD_FOLDER, "index", f"user_{user.id}", f"dict_{dict_version}")
 
-        # 파일 존재 여부 체크
-        if not os.path.exists(query_path):
-            await websocket.send_json({"error": f"쿼리 파일 없음: {qid}"})
-            continue
+        if job_id in inline_queries:
+            # 웹소켓으로 받아 spool 에 써 둔 쿼리
+            query_path, digest = inline_queries[job_id]
+        else:
+            # 쿼리 파일 경로
+            query_path = os.path.join(UPLOAD_FOLDER, "query", f"user_{user.id}", f"{qid}.eiv")
+
+            # 파일 존재 여부 체크
+            if not os.path.exists(query_path):
+                await websocket.send_json({"job_id": job_id, "error": f"쿼리 파일 없음: {qid}"})
+                continue
+            digest = await asyncio.to_thread(query_digest, query_path) if RESULT_CACHE_BYTES > 0 else None
 
         query_jobs.append({
+            "job_id": job_id,  # 요청 items 내 순번 (결과가 어느 작업의 것인지 구분)
+            "query_id": qid,
             "query_path": query_path,
             "vector_folder": vector_folder,
             "dict_version": dict_version,
+            "dict_id": dict_row.id,
             "poly_degree": dict_row.poly_degree,
-            "keys_path": keys_path
+            "keys_path": keys_path,
+            "binary": binary,
+            "compression": compression,
+            "mod_switch": dict_row.mod_switch,
+            "packed": packed,
+            "threads": ENGINE_THREADS,  # 폴더 전체를 스캔하므로 엔진 내부에서 병렬 처리
+            "index_generation": dict_row.index_generation,
+            # 결과 캐시 키 (쿼리 내용 hash)
+            "query_digest": digest,
         })
 
     print(query_jobs)
+    SEARCH_STAGE_SECONDS.observe(time.perf_counter() - setup_start, stage="job_setup")
+
+    # C++ 연산 실행 (상주 엔진 풀 사용)
+    # 세션 내 작업들을 동시에 실행하고, 결과는 도착하는 순서대로 하나의 웹소켓 스트림으로 합침
+    # 크기를 제한해서 클라이언트가 느리게 읽으면 작업들이 put 에서 기다리도록 함
+    send_queue = asyncio.Queue(maxsize=SEARCH_SEND_QUEUE_SIZE)
+    job_slots = asyncio.Semaphore(SEARCH_JOB_CONCURRENCY)
+
+    async def run_with_slot(jobs):
+        async with job_slots:
+            await run_query_group(jobs, user, send_queue)
+
+    tasks = [asyncio.create_task(run_with_slot(jobs)) for jobs in group_jobs(query_jobs)]
 
-    # C++ 연산 실행
-    # Docker : /app/bin/fhe_search_engine , 로컬 : ./bin/fhe_search_engine
-    FHE_SEARCH_BIN = "/app/bin/fhe_search_engine"
-    if not os.path.exists(FHE_SEARCH_BIN):
-        # 로컬 테스트용 경로 (예시)
-        FHE_SEARCH_BIN = "./bin/fhe_search_engine"
-
-        # 검색 작업(Job) 하나씩 순회
-        for job in query_jobs:
-            cmd = [
-                FHE_SEARCH_BIN,
-                "--query", job["query_path"],
-                "--vector-folder", job["vector_folder"],
-                "--poly-degree", str(job["poly_degree"]),
-                "--keys-path", job["keys_path"]
-            ]
-
-            try:
-                process = await asyncio.create_subprocess_exec(
-                    *cmd,
-                    stdout=asyncio.subprocess.PIPE,
-                    stderr=asyncio.subprocess.PIPE,
-                    limit=1024 * 1024 * 100
-                )
-            except Exception as e:
-                await websocket.send_json({"error": f"C++ 실행 실패: {str(e)}"})
+    async def close_queue_when_done():
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await send_queue.put(None)
+
+    closer = asyncio.create_task(close_queue_when_done())
+
+    send_seconds = 0.0
+    try:
+        while True:
+            message = await send_queue.get()
+            if message is None:
+                break
+            send_start = time.perf_counter()
+            if isinstance(message, bytes):
+                await websocket.send_bytes(message)
+            else:
+                await websocket.send_json(message)
+            send_seconds += time.perf_counter() - send_start
+
+        await websocket.send_json({"status": "end"})
+        await websocket.close()
+    finally:
+        # 세션 전체에서 웹소켓 전송에 쓴 시간
+        SEARCH_STAGE_SECONDS.observe(send_seconds, stage="ws_send")
+        # 클라이언트가 중간에 끊으면 남은 작업 정리
+        for task in tasks:
+            task.cancel()
+        closer.cancel()
+        # 엔진은 작업 시작 시 쿼리를 읽으므로 남은 작업을 기다린 뒤 spool 파일 삭제
+        await asyncio.gather(*tasks, return_exceptions=True)
+        remove_spool_files(spool_paths)
+
+
+def spool_inline_query(data: bytes):
+    """inline 쿼리를 spool 에 쓰고 (경로, 결과 캐시 키용 sha256) 반환 (스레드에서 호출)"""
+    digest = hashlib.sha256(data).hexdigest() if RESULT_CACHE_BYTES > 0 else None
+    return write_spool_file(data), digest
+
+
+def negotiate_compression(requested) -> str:
+    """클라이언트가 받을 수 있는 압축 방식(선호 순서) 중 서버가 허용하는 첫 번째. 없으면 none"""
+    if isinstance(requested, str):
+        requested = [requested]
+    for mode in requested:
+        if mode in SEARCH_COMPRESSION_MODES:
+            return mode
+    return "none"
+
+
+def deflate_score(score, binary: bool):
+    """deflate 모드: 결과 암호문 바이트를 zlib 으로 압축 (JSON 모드면 base64 를 풀고 압축한 뒤 다시 base64)"""
+    if binary:
+        return zlib.compress(score, SEARCH_DEFLATE_LEVEL)
+    return base64.b64encode(zlib.compress(base64.b64decode(score), SEARCH_DEFLATE_LEVEL)).decode()
+
+
+def payload_length(score, binary: bool) -> int:
+    """결과 암호문 바이트 수 (JSON 모드면 base64 를 디코딩한 크기)"""
+    if binary:
+        return len(score)
+    return len(score) * 3 // 4 - score[-2:].count("=")
+
+
+def build_result(job: dict, file_id, score):
+    """클라이언트로 보낼 결과 하나와 그 크기. 바이너리 모드면 헤더 + 바이트, 아니면 JSON dict
+
+    packed 작업이면 file_id 는 슬롯 순서의 file_id 목록 (매핑되지 않은 슬롯은 None)
+    """
+    if job.get("packed"):
+        if job.get("binary"):
+            slots = struct.pack(f"<{len(file_id)}q", *(-1 if doc_id is None else doc_id for doc_id in file_id))
+            frame = PACKED_FRAME_HEADER.pack(job["job_id"], len(file_id), len(score)) + slots + score
+            return frame, len(frame)
+
+        return {
+            "job_id": job["job_id"],
+            "query_id": job["query_id"],
+            "dict_version": job["dict_version"],
+            "packed": True,
+            "file_ids": file_id,
+            "score": score,
+        }, len(score or "")
+
+    if job.get("binary"):
+        # 엔진이 출력한 바이트를 디코딩 없이 헤더만 붙여서 전달
+        frame = RESULT_FRAME_HEADER.pack(job["job_id"], file_id, len(score)) + score
+        return frame, len(frame)
+
+    return {
+        "job_id": job["job_id"],
+        "query_id": job["query_id"],
+        "dict_version": job["dict_version"],
+        "file_id": file_id,
+        "score": score,
+    }, len(score or "")
+
+
+async def replay_cached_job(job: dict, cached: CachedResults, send_queue: asyncio.Queue):
+    total_traffic_size = 0
+    result_count = 0
+    for file_id, score in cached.iter_items("binary" if job.get("binary") else "json"):
+        result, size = build_result(job, file_id, score)
+        total_traffic_size += size
+        result_count += 1
+        await send_queue.put(result)
+
+    SEARCH_BYTES_SENT.observe(total_traffic_size)
+    SEARCH_JOBS.inc(outcome="cached")
+    print(f"[RESULT CACHE] job {job['job_id']} replayed {result_count} results ({total_traffic_size} Bytes)")
+
+
+def group_jobs(query_jobs: list) -> list:
+    """같은 사전 버전의 작업들을 SEARCH_QUERIES_PER_PASS 개씩 묶음. 한 묶음은 엔진이 인덱스 벡터를 한 번만 읽어서 처리"""
+    by_version = {}
+    for job in query_jobs:
+        by_version.setdefault(job["dict_version"], []).append(job)
+
+    return [jobs[i:i + SEARCH_QUERIES_PER_PASS]
+            for jobs in by_version.values()
+            for i in range(0, len(jobs), SEARCH_QUERIES_PER_PASS)]
+
+
+async def run_query_group(jobs: list, user: AuthUser, send_queue: asyncio.Queue):
+    """같은 사전 버전에 대한 검색 작업들을 엔진 스캔 한 번으로 실행하고, 결과를 각 작업의 job_id 를 붙여 send_queue 로 보낸다.
+
+    엔진은 인덱스 벡터를 하나씩 읽어 모든 쿼리에 대해 연산하고, 결과에 쿼리 순번("query")을 붙여 출력한다.
+    """
+    # 같은 쿼리 / 사전 버전 / 인덱스 generation 으로 끝까지 실행된 결과가 있으면 엔진을 돌리지 않음
+    pending = []
+    for job in jobs:
+        cache_key = None
+        if job.get("query_digest"):
+            cache_key = (user.id, job["query_digest"], job["dict_version"], job["index_generation"],
+                         job["compression"], job["mod_switch"], job["packed"])
+            cached = result_cache.get(cache_key)
+            if cached is not None:
+                SEARCH_RESULT_CACHE.inc(outcome="hit")
+                await replay_cached_job(job, cached, send_queue)
                 continue
+            SEARCH_RESULT_CACHE.inc(outcome="miss")
+        pending.append((job, {
+            "cache_key": cache_key,
+            # 클라이언트로 보낸 결과 크기 합계와 개수 (작업이 끝날 때 한 번 출력)
+            "traffic": 0,
+            "count": 0,
+            # 캐시에 넣을 (file_id, score). 결과를 하나라도 처리하지 못했거나 캐시보다 커지면 넣지 않음
+            "cache_items": [] if cache_key is not None else None,
+            "cache_bytes": 0,
+            # 결과 암호문의 압축 전 / 후 바이트 수 (압축률 메트릭)
+            "raw_bytes": 0,
+            "payload_bytes": 0,
+            "error": False,
+        }))
+
+    if not pending:
+        return
 
-            # [트래픽 측정용 변수 유지]
-            total_traffic_size = 0
+    lead = pending[0][0]
+    mapping_seconds = 0.0
 
-            # stdout 읽기 루프 (결과 처리)
-            while True:
-                line = await process.stdout.readline()
-                if not line:
-                    break
+    try:
+        # index_id -> doc_id 매핑은 스트리밍 전에 한 번에 로드 (결과마다 DB 조회하지 않음)
+        # AsyncSession 은 여러 작업이 동시에 공유할 수 없으므로 작업마다 따로 연다
+        with SEARCH_STAGE_SECONDS.time(stage="index_map"):
+            async with AsyncSessionLocal() as db:
+                index_map = await load_index_map(db, user.id, lead["dict_id"], lead["dict_version"],
+                                                 lead["index_generation"])
 
-                decoded_line = line.decode().strip()
-                if not decoded_line: continue
+        engine_job = dict(lead, query_paths=[job["query_path"] for job, _ in pending])
+
+        async with engine_pool.acquire(lead["keys_path"]) as worker:
+            # stdout 읽기 루프 (결과 처리)
+            async for cpp_result in worker.search(engine_job):
+                query_no = cpp_result.get("query", 0)
+                if not 0 <= query_no < len(pending):
+                    continue
+                job, state = pending[query_no]
 
                 try:
-                    cpp_result = json.loads(decoded_line)
-                    index_id = cpp_result.get("index_id")
-                    enc_score = cpp_result.get("enc_score")
-
-                    if index_id is None: continue
-
-                    # DB 매핑
-                    index_row = db.query(IndexVector).filter(
-                        IndexVector.owner_id == user.id,
-                        IndexVector.id == index_id
-                    ).first()
-
-                    if index_row:
-                        result = {
-                            "file_id": index_row.doc_id,
-                            "score": enc_score,
-                        }
-
-                        # [요청하신 대로 트래픽 로직은 그대로 유지]
-                        json_str = json.dumps(result)
-                        real_traffic_size = len(json_str.encode('utf-8'))
-                        print(
-                            f"[BENCHMARK_TRAFFIC] Size: {real_traffic_size} Bytes ({real_traffic_size / 1024:.2f} KB)")
-
-                        await websocket.send_json(result)
-
-                except json.JSONDecodeError:
-                    pass
+                    if cpp_result.get("error"):
+                        # 쿼리 파일을 읽지 못한 경우 해당 작업만 실패 처리
+                        state["error"] = True
+                        state["cache_items"] = None
+                        await send_queue.put({"job_id": job["job_id"], "error": f"C++ 실행 실패: {cpp_result['error']}"})
+                        continue
+
+                    # 매핑 (메모리 조회)
+                    mapping_start = time.perf_counter()
+                    if "index_ids" in cpp_result:
+                        # packed 결과: 슬롯마다 매핑 (연산 실패 슬롯 -1 / 삭제된 문서는 None). 전부 None 이면 보내지 않음
+                        doc_id = [await lookup_doc_id(index_map, user.id, index_id) if index_id >= 0 else None
+                                  for index_id in cpp_result["index_ids"]]
+                        if all(slot is None for slot in doc_id):
+                            doc_id = None
+                    elif cpp_result.get("index_id") is not None:
+                        doc_id = await lookup_doc_id(index_map, user.id, cpp_result["index_id"])
+                    else:
+                        continue
+                    mapping_seconds += time.perf_counter() - mapping_start
+
+                    if doc_id is not None:
+                        binary = bool(job.get("binary"))
+                        score = cpp_result["enc_score_bytes"] if binary else cpp_result.get("enc_score")
+                        raw_length = cpp_result.get("raw_length") or payload_length(score, binary)
+                        if job.get("compression") == "deflate":
+                            # 결과 하나 압축에 수 ms 가 걸리므로 이벤트 루프를 막지 않도록 스레드에서
+                            score = await asyncio.to_thread(deflate_score, score, binary)
+                        state["raw_bytes"] += raw_length
+                        state["payload_bytes"] += payload_length(score, binary)
+
+                        result, size = build_result(job, doc_id, score)
+                        state["traffic"] += size
+                        state["count"] += 1
+
+                        if state["cache_items"] is not None:
+                            state["cache_items"].append((doc_id, score))
+                            state["cache_bytes"] += len(score)
+                            if state["cache_bytes"] > result_cache.max_bytes:
+                                state["cache_items"] = None
+
+                        # 큐가 가득 차 있으면 여기서 기다림 -> 엔진 stdout 을 읽지 않으므로 엔진도 멈춤
+                        await send_queue.put(result)
+
                 except Exception as e:
                     print(f"Processing Error: {e}")
-
-            stderr_data = await process.stderr.read()
-            await process.wait()  # 프로세스 종료 대기
+                    state["cache_items"] = None
+
+            for job, state in pending:
+                if state["cache_items"] is not None:
+                    result_cache.set(state["cache_key"],
+                                     CachedResults("binary" if job.get("binary") else "json", state["cache_items"]))
+                SEARCH_BYTES_SENT.observe(state["traffic"])
+                SEARCH_JOBS.inc(outcome="error" if state["error"] else "ok")
+
+                # 엔진이 실제로 적용한 압축 (요청한 방식을 엔진의 SEAL 빌드가 지원하지 않으면 none)
+                applied = job["compression"] if job.get("compression") == "deflate" else \
+                    (worker.last_stats or {}).get("compression", "none")
+                SEARCH_RESULT_RAW_BYTES.observe(state["raw_bytes"], compression=applied)
+                SEARCH_RESULT_PAYLOAD_BYTES.observe(state["payload_bytes"], compression=applied)
+
+            SEARCH_STAGE_SECONDS.observe(mapping_seconds, stage="db_mapping")
+            if worker.last_stats:
+                SEARCH_STAGE_SECONDS.observe(worker.last_stats.get("elapsed", 0), stage="engine_compute")
+                SEARCH_VECTORS_SCANNED.observe(worker.last_stats.get("vectors", 0))
 
             # 여기서 바로 출력해야 매 검색마다 뜹니다.
-            if stderr_data:
-                print(f"======== [C++ TIME LOG] ========")
-                print(f"{stderr_data.decode().strip()}")
+            if worker.last_stats:
+                print(f"======== [C++ TIME LOG] jobs {[job['job_id'] for job, _ in pending]} ========")
+                print(f"[BENCHMARK TIME]{worker.last_stats.get('elapsed')}")
+                for job, state in pending:
+                    print(f"[BENCHMARK_TRAFFIC] job {job['job_id']}: {state['count']} results, "
+                          f"Size: {state['traffic']} Bytes ({state['traffic'] / 1024:.2f} KB), "
+                          f"ciphertext {state['raw_bytes']} -> {state['payload_bytes']} Bytes")
                 print("================================")
 
-    await websocket.send_json({"status": "end"})
-    await websocket.close()
\ No newline at end of file
+    except Exception as e:
+        for job, _ in pending:
+            SEARCH_JOBS.inc(outcome="error")
+            await send_queue.put({"job_id": job["job_id"], "error": f"C++ 실행 실패: {str(e)}"})
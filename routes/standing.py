@@ -0,0 +1,219 @@
+import asyncio
+from fastapi import APIRouter, HTTPException, Depends, WebSocket, UploadFile, Form, File
+from pydantic import BaseModel
+from sqlalchemy import select, delete
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from db import AsyncSessionLocal
+from models import Dictionary, StandingQuery, StandingResult
+from dependencies.auth import get_current_user, AuthUser
+from utils.standing import standing_hub, store_results
+from utils.upload import save_upload_file, remove_quietly
+from settings import MAX_QUERY_BYTES
+import os, uuid
+
+router = APIRouter()
+
+UPLOAD_FOLDER = "uploads"
+
+# 수신함 조회 한 번에 돌려주는 최대 결과 수
+INBOX_PAGE_MAX_LIMIT = 500
+
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+# ----------------
+# Standing query 등록 / 조회 / 삭제
+# ----------------
+
+@router.post("/standing/register")
+async def register_standing_query(
+        dict_version: int = Form(...),
+        query: UploadFile = File(...),
+        db: AsyncSession = Depends(get_async_db),
+        user: AuthUser = Depends(get_current_user),
+):
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found.")
+
+    result = await db.execute(select(Dictionary.id).filter(
+        Dictionary.owner_id == user.id, Dictionary.version == dict_version
+    ))
+    dict_id = result.scalar()
+    if dict_id is None:
+        raise HTTPException(status_code=404, detail="사전 정보가 없습니다.")
+
+    # 쿼리 저장 폴더 (일반 검색 쿼리와 달리 삭제할 때까지 보관)
+    user_standing_dir = os.path.join(UPLOAD_FOLDER, "standing", f"user_{user.id}")
+    os.makedirs(user_standing_dir, exist_ok=True)
+    query_path = os.path.join(user_standing_dir, f"{uuid.uuid4()}.eiv")
+    await save_upload_file(query, query_path, MAX_QUERY_BYTES)
+
+    standing_query = StandingQuery(
+        owner_id=user.id,
+        dict_id=dict_id,
+        dict_version=dict_version,
+        query_path=query_path,
+    )
+    db.add(standing_query)
+    try:
+        await db.commit()
+    except BaseException:
+        remove_quietly(query_path)
+        raise
+
+    return {"standing_query_id": standing_query.id, "dict_version": dict_version}
+
+
+@router.get("/standing/list")
+async def list_standing_queries(db: AsyncSession = Depends(get_async_db), user: AuthUser = Depends(get_current_user)):
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found.")
+
+    result = await db.execute(select(StandingQuery).filter(StandingQuery.owner_id == user.id).order_by(StandingQuery.id))
+    return {"standing_queries": [{
+        "standing_query_id": row.id,
+        "dict_version": row.dict_version,
+        "created_at": row.created_at,
+    } for row in result.scalars()]}
+
+
+class StandingDeleteRequest(BaseModel):
+    standing_query_id: int
+
+
+@router.post("/standing/delete")
+async def delete_standing_query(body: StandingDeleteRequest, db: AsyncSession = Depends(get_async_db),
+                                user: AuthUser = Depends(get_current_user)):
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found.")
+
+    result = await db.execute(select(StandingQuery).filter(
+        StandingQuery.owner_id == user.id, StandingQuery.id == body.standing_query_id
+    ))
+    standing_query = result.scalar()
+    if not standing_query:
+        raise HTTPException(status_code=404, detail="등록된 쿼리가 존재하지 않습니다.")
+
+    # 수신함 결과 먼저 삭제 (외래키)
+    await db.execute(delete(StandingResult).where(StandingResult.standing_query_id == standing_query.id))
+    await db.delete(standing_query)
+    await db.commit()
+
+    remove_quietly(standing_query.query_path)
+    return {"message": "등록된 쿼리 삭제가 완료되었습니다."}
+
+
+# ----------------
+# 결과 수신함 (웹소켓이 연결되어 있지 않을 때 저장된 결과)
+# ----------------
+
+class InboxRequest(BaseModel):
+    after_id: int = 0
+    limit: int = 100
+
+
+@router.post("/standing/results")
+async def list_standing_results(body: InboxRequest, db: AsyncSession = Depends(get_async_db),
+                                user: AuthUser = Depends(get_current_user)):
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found.")
+    if body.limit < 1:
+        raise HTTPException(status_code=400, detail="limit 값이 올바르지 않습니다.")
+
+    result = await db.execute(
+        select(StandingResult, StandingQuery.dict_version)
+        .join(StandingQuery, StandingResult.standing_query_id == StandingQuery.id)
+        .filter(StandingResult.owner_id == user.id, StandingResult.id > body.after_id)
+        .order_by(StandingResult.id)
+        .limit(min(body.limit, INBOX_PAGE_MAX_LIMIT))
+    )
+    items = [{
+        "result_id": row.id,
+        "standing_query_id": row.standing_query_id,
+        "dict_version": dict_version,
+        "file_id": row.file_id,
+        "score": row.enc_score,
+    } for row, dict_version in result.all()]
+
+    # 받은 결과는 /standing/results/ack 로 확인해야 수신함에서 지워짐 (클라이언트가 처리 전에 죽어도 잃지 않음)
+    return {"items": items, "last_id": items[-1]["result_id"] if items else body.after_id}
+
+
+class InboxAckRequest(BaseModel):
+    last_id: int
+
+
+@router.post("/standing/results/ack")
+async def ack_standing_results(body: InboxAckRequest, db: AsyncSession = Depends(get_async_db),
+                               user: AuthUser = Depends(get_current_user)):
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found.")
+
+    result = await db.execute(delete(StandingResult).where(
+        StandingResult.owner_id == user.id, StandingResult.id <= body.last_id
+    ))
+    await db.commit()
+    return {"deleted": result.rowcount}
+
+
+# ----------------
+# 실시간 결과 (웹소켓)
+# ----------------
+
+@router.websocket("/standing/stream")
+async def standing_stream(websocket: WebSocket):
+    await websocket.accept()
+
+    # 사용자 토큰 받기
+    token = websocket.query_params.get("token")
+    if not token:
+        await websocket.close(code=4000, reason="토큰이 없습니다.")
+        return
+
+    try:
+        user = await get_current_user(token)
+    except Exception:
+        await websocket.close(code=4001, reason="토큰이 유효하지 않습니다.")
+        return
+
+    if not user:
+        await websocket.close(code=4001, reason="회원 인증 실패")
+        return
+
+    queue = standing_hub.subscribe(user.id)
+
+    async def wait_disconnect():
+        # 클라이언트가 보내는 메시지는 무시하고 연결 종료만 감지
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                return
+
+    receiver = asyncio.create_task(wait_disconnect())
+    message = None
+    try:
+        while True:
+            getter = asyncio.create_task(queue.get())
+            done, _ = await asyncio.wait({getter, receiver}, return_when=asyncio.FIRST_COMPLETED)
+            if getter not in done:
+                getter.cancel()
+                break
+            message = getter.result()
+            await websocket.send_json(message)
+            message = None
+    except Exception as e:
+        print(f"[STANDING] websocket closed: {e}")
+    finally:
+        standing_hub.unsubscribe(user.id, queue)
+        receiver.cancel()
+
+        # 보내지 못한 결과는 수신함으로
+        pending = [message] if message is not None else []
+        while not queue.empty():
+            pending.append(queue.get_nowait())
+        if pending:
+            await store_results(user.id, pending)
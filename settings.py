@@ -4,4 +4,67 @@ from dotenv import load_dotenv
 load_dotenv()
 SECRET_KEY = os.getenv("SECRET_KEY", "fallback_secure_random_string_for_dev")
 ALGORITHM = "HS256"
-ACCESS_TOKEN_EXPIRE_MINUTES = 30
\ No newline at end of file
+ACCESS_TOKEN_EXPIRE_MINUTES = 30
+
+# C++ 검색 엔진 (Docker : /app/bin/fhe_search_engine , 로컬 : ./bin/fhe_search_engine)
+FHE_SEARCH_BIN = os.getenv("FHE_SEARCH_BIN") or (
+    "/app/bin/fhe_search_engine" if os.path.exists("/app/bin/fhe_search_engine") else "./bin/fhe_search_engine"
+)
+# 상주 엔진 프로세스 수, 프로세스당 연산 키 캐시 메모리 예산(MB)
+ENGINE_POOL_SIZE = int(os.getenv("ENGINE_POOL_SIZE", "2"))
+ENGINE_KEY_CACHE_MB = int(os.getenv("ENGINE_KEY_CACHE_MB", "1024"))
+# 검색 한 건이 엔진 안에서 쓰는 연산 스레드 수 (기본: 코어 수 / 엔진 프로세스 수)
+ENGINE_THREADS = int(os.getenv("ENGINE_THREADS") or max(1, (os.cpu_count() or 1) // ENGINE_POOL_SIZE))
+# 웹소켓 검색 세션 하나에서 동시에 실행할 검색 작업 수
+SEARCH_JOB_CONCURRENCY = int(os.getenv("SEARCH_JOB_CONCURRENCY", "4"))
+# 웹소켓 검색 세션의 전송 대기 결과 수. 가득 차면 엔진 출력을 읽지 않아 엔진도 멈춤 (느린 클라이언트 backpressure)
+SEARCH_SEND_QUEUE_SIZE = int(os.getenv("SEARCH_SEND_QUEUE_SIZE", "32"))
+# 검색 결과 압축 방식 중 서버가 허용하는 것 (클라이언트 요청과 협상). zstd / zlib 은 엔진의 SEAL 직렬화 압축
+# (엔진의 SEAL 빌드가 지원하지 않으면 압축 없이 전송), deflate 는 백엔드가 결과 바이트를 zlib 으로 압축
+SEARCH_COMPRESSION_MODES = [mode.strip() for mode in os.getenv("SEARCH_COMPRESSION_MODES", "zstd,zlib,deflate").split(",")
+                            if mode.strip()]
+# deflate 압축 레벨 (1: 빠름 ~ 9: 작음)
+SEARCH_DEFLATE_LEVEL = int(os.getenv("SEARCH_DEFLATE_LEVEL", "6"))
+# 같은 사전 버전의 쿼리를 엔진 스캔 한 번에 묶어서 평가할 최대 개수 (인덱스 벡터를 한 번만 읽음)
+SEARCH_QUERIES_PER_PASS = int(os.getenv("SEARCH_QUERIES_PER_PASS", "16"))
+# 웹소켓 검색 세션 하나에서 받을 수 있는 inline 쿼리 수 (세션당 spool 사용량 = 이 값 x MAX_QUERY_MB 이하)
+SEARCH_MAX_INLINE_QUERIES = int(os.getenv("SEARCH_MAX_INLINE_QUERIES", "64"))
+# 검색용 index_id -> doc_id 매핑 캐시에 보관할 (사용자, 사전 버전) 개수
+INDEX_MAP_CACHE_SIZE = int(os.getenv("INDEX_MAP_CACHE_SIZE", "256"))
+
+# 업로드 스트리밍 청크 크기와 파일별 최대 크기
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", str(1024 * 1024)))
+MAX_FILE_UPLOAD_BYTES = int(os.getenv("MAX_FILE_UPLOAD_MB", "1024")) * 1024 * 1024
+MAX_INDEX_VECTOR_BYTES = int(os.getenv("MAX_INDEX_VECTOR_MB", "16")) * 1024 * 1024
+MAX_QUERY_BYTES = int(os.getenv("MAX_QUERY_MB", "16")) * 1024 * 1024
+MAX_EVAL_KEY_BYTES = int(os.getenv("MAX_EVAL_KEY_MB", "512")) * 1024 * 1024
+
+# get_current_user 인증 캐시 (token -> 사용자) 크기와 유지 시간(초)
+AUTH_CACHE_SIZE = int(os.getenv("AUTH_CACHE_SIZE", "10000"))
+AUTH_CACHE_TTL_SECONDS = int(os.getenv("AUTH_CACHE_TTL_SECONDS", "60"))
+
+# Argon2 비밀번호 검증 전용 프로세스 수와 최대 대기 요청 수 (초과 시 503)
+ARGON2_MAX_WORKERS = int(os.getenv("ARGON2_MAX_WORKERS", "2"))
+ARGON2_MAX_QUEUE = int(os.getenv("ARGON2_MAX_QUEUE", "16"))
+
+# 폴더 목록 페이지 크기 (기본값, 최대값)
+FOLDER_PAGE_DEFAULT_LIMIT = int(os.getenv("FOLDER_PAGE_DEFAULT_LIMIT", "100"))
+FOLDER_PAGE_MAX_LIMIT = int(os.getenv("FOLDER_PAGE_MAX_LIMIT", "500"))
+
+# 사전 blob 을 gzip 으로 압축해서 저장할지 여부
+DICT_BLOB_GZIP = os.getenv("DICT_BLOB_GZIP", "false").lower() in ("1", "true", "yes")
+
+# 인덱스 세그먼트 하나의 최대 크기와, 삭제된 바이트 비율이 이 값을 넘으면 압축
+SEGMENT_MAX_BYTES = int(os.getenv("SEGMENT_MAX_MB", "256")) * 1024 * 1024
+SEGMENT_COMPACT_RATIO = float(os.getenv("SEGMENT_COMPACT_RATIO", "0.3"))
+
+# 검색 결과 캐시 크기 (결과 암호문 바이트 기준, 0 이면 사용 안 함)
+RESULT_CACHE_BYTES = int(os.getenv("RESULT_CACHE_MB", "256")) * 1024 * 1024
+
+# 웹소켓으로 받은 쿼리 암호문을 엔진에 넘기기 위해 잠깐 쓰는 폴더 (가능하면 메모리 기반 /dev/shm)
+QUERY_SPOOL_DIR = os.getenv("QUERY_SPOOL_DIR") or (
+    "/dev/shm/he_query_spool" if os.path.isdir("/dev/shm") else os.path.join("uploads", "query_spool")
+)
+# /upload/queries 로 올린 쿼리 파일 보관 시간(초)과 정리 주기(초)
+QUERY_FILE_TTL_SECONDS = int(os.getenv("QUERY_FILE_TTL_SECONDS", "3600"))
+QUERY_GC_INTERVAL_SECONDS = int(os.getenv("QUERY_GC_INTERVAL_SECONDS", "300"))
@@ -0,0 +1,108 @@
+import fcntl
+import gzip
+import hashlib
+import os
+from contextlib import contextmanager, ExitStack
+
+from settings import DICT_BLOB_GZIP
+from utils.upload import temp_path_for, remove_quietly
+
+# ----------------
+# 내용 주소 기반 blob 저장소
+# ----------------
+# blob 은 sha256(원본) 이름으로 uploads/blobs/ab/<hash> 에 저장한다. (gzip 저장 시 <hash>.gz)
+# 같은 내용은 한 번만 저장되며, 이미 있는 hash 를 다시 올리면 쓰기 없이 끝난다.
+# 여러 사전이 같은 blob 을 공유하므로, blob 을 쓰고 그 hash 를 가리키는 행을 커밋하는 쪽과
+# 참조가 없는지 확인하고 지우는 쪽은 blob_lock 안에서 실행한다. (확인과 삭제 사이에 새 참조가 커밋되지 않도록)
+
+UPLOAD_FOLDER = "uploads"
+BLOB_FOLDER = os.path.join(UPLOAD_FOLDER, "blobs")
+
+
+def blob_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def _base_path(content_hash: str) -> str:
+    return os.path.join(BLOB_FOLDER, content_hash[:2], content_hash)
+
+
+@contextmanager
+def blob_lock(content_hashes):
+    """hash 앞 두 글자 폴더 단위 flock (여러 워커 프로세스 간). 여러 개면 정렬된 순서로 잡아 교착을 피한다.
+
+    flock 은 같은 프로세스에서도 다시 잡으면 막히므로 안에서 다시 blob_lock 을 호출하지 않는다.
+    """
+    with ExitStack() as stack:
+        for shard in sorted({content_hash[:2] for content_hash in content_hashes}):
+            folder = os.path.join(BLOB_FOLDER, shard)
+            os.makedirs(folder, exist_ok=True)
+            fd = os.open(os.path.join(folder, ".lock"), os.O_RDWR | os.O_CREAT, 0o644)
+            stack.callback(os.close, fd)
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            stack.callback(fcntl.flock, fd, fcntl.LOCK_UN)
+        yield
+
+
+def find_blob(content_hash: str):
+    """저장된 blob 의 (경로, gzip 여부) 를 반환. 없으면 (None, False)"""
+    base = _base_path(content_hash)
+    if os.path.exists(base):
+        return base, False
+    if os.path.exists(base + ".gz"):
+        return base + ".gz", True
+    return None, False
+
+
+def put_blob(data: bytes, content_hash: str = None) -> str:
+    """data 를 저장하고 hash 를 반환. 같은 hash 의 blob 이 이미 있으면 쓰지 않는다."""
+    content_hash = content_hash or blob_hash(data)
+    path, _ = find_blob(content_hash)
+    if path is not None:
+        return content_hash
+
+    dest_path = _base_path(content_hash)
+    payload = data
+    if DICT_BLOB_GZIP:
+        dest_path += ".gz"
+        payload = gzip.compress(data, compresslevel=6)
+
+    os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+    tmp_path = temp_path_for(dest_path)
+    try:
+        with open(tmp_path, "wb") as f:
+            f.write(payload)
+        # 동시에 같은 blob 을 쓰더라도 내용이 같으므로 마지막 rename 이 이겨도 무방
+        os.replace(tmp_path, dest_path)
+    except BaseException:
+        remove_quietly(tmp_path)
+        raise
+
+    return content_hash
+
+
+def read_blob(content_hash: str):
+    """blob 전체를 (압축 해제된) bytes 로 반환. 없으면 None"""
+    path, gzipped = find_blob(content_hash)
+    if path is None:
+        return None
+    with open(path, "rb") as f:
+        data = f.read()
+    return gzip.decompress(data) if gzipped else data
+
+
+def iter_blob(path: str, gzipped: bool, chunk_size: int = 1024 * 1024):
+    """gzip 으로 저장된 blob 을 받을 수 없는 클라이언트용: 압축을 풀면서 청크 단위로 내보냄"""
+    opener = gzip.open if gzipped else open
+    with opener(path, "rb") as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+
+
+def delete_blob(content_hash: str):
+    path, _ = find_blob(content_hash)
+    if path is not None:
+        remove_quietly(path)
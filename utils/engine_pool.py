@@ -0,0 +1,209 @@
+import asyncio
+import json
+from contextlib import asynccontextmanager
+
+from settings import FHE_SEARCH_BIN, ENGINE_POOL_SIZE, ENGINE_KEY_CACHE_MB
+from utils.metrics import SEARCH_STAGE_SECONDS
+
+# json 출력 모드에서는 결과 암호문(base64)이 한 줄에 실리므로 readline 버퍼를 넉넉하게 잡음
+STREAM_LIMIT = 1024 * 1024 * 100
+
+
+class EngineError(Exception):
+    pass
+
+
+# ----------------
+# 상주 검색 엔진 프로세스
+# ----------------
+
+class EngineWorker:
+    """`fhe_search_engine --serve` 프로세스 하나. 요청은 한 번에 하나씩만 처리한다."""
+
+    def __init__(self, worker_id: int):
+        self.worker_id = worker_id
+        self.process = None
+        self.last_keys_path = None  # 같은 사용자의 검색을 같은 워커로 보내기 위해 기록
+        self.last_stats = None  # 마지막 검색의 done 메시지 (elapsed 등)
+        self.pending_invalidations = set()
+        self.in_flight = False
+        self._stderr_task = None
+
+    @property
+    def alive(self):
+        return self.process is not None and self.process.returncode is None
+
+    async def start(self):
+        self.process = await asyncio.create_subprocess_exec(
+            FHE_SEARCH_BIN, "--serve",
+            "--key-cache-mb", str(ENGINE_KEY_CACHE_MB),
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            limit=STREAM_LIMIT,
+        )
+        # 새 프로세스는 키 캐시가 비어 있으므로 무효화할 것도 없음
+        self.pending_invalidations.clear()
+        self.last_keys_path = None
+        self.in_flight = False
+        self._stderr_task = asyncio.create_task(self._drain_stderr())
+        print(f"[ENGINE {self.worker_id}] 검색 엔진 시작 (pid={self.process.pid})")
+
+    async def stop(self):
+        if self.alive:
+            self.process.kill()
+            await self.process.wait()
+        if self._stderr_task:
+            self._stderr_task.cancel()
+        self.process = None
+
+    async def _drain_stderr(self):
+        # 파이프가 가득 차서 엔진이 멈추지 않도록 stderr 를 계속 비워줌 ([BENCHMARK TIME] 로그 등)
+        while True:
+            line = await self.process.stderr.readline()
+            if not line:
+                break
+            print(f"[ENGINE {self.worker_id}] {line.decode(errors='replace').rstrip()}")
+
+    async def _send(self, payload: dict):
+        self.process.stdin.write((json.dumps(payload) + "\n").encode())
+        await self.process.stdin.drain()
+
+    async def flush_invalidations(self):
+        while self.pending_invalidations:
+            await self._send({"cmd": "invalidate", "keys_path": self.pending_invalidations.pop()})
+
+    async def search(self, job: dict):
+        """검색 요청을 보내고, 엔진이 출력하는 결과(dict)를 done 표시가 나올 때까지 돌려준다.
+
+        job["binary"] 가 참이면 엔진은 결과마다 {"index_id", "length"} 헤더 줄과 원본 바이트를 출력하며,
+        이때 결과 dict 의 "enc_score_bytes" 에 디코딩 없이 바이트를 그대로 담는다.
+        호출하는 쪽이 결과를 늦게 가져가면 stdout 을 읽지 않으므로 엔진도 출력에서 멈춘다 (backpressure).
+        """
+        self.in_flight = True
+        self.last_stats = None
+        request = {
+            "cmd": "search",
+            "vector_folder": job["vector_folder"],
+            "poly_degree": job["poly_degree"],
+            "keys_path": job["keys_path"],
+            "output": "binary" if job.get("binary") else "json",
+        }
+        # job["query_paths"] 가 있으면 인덱스 벡터를 한 번 읽어서 여러 쿼리를 같이 평가 (결과의 "query" 는 목록 순번)
+        if job.get("query_paths"):
+            request["queries"] = list(job["query_paths"])
+        else:
+            request["query"] = job["query_path"]
+        # 결과 직렬화 압축 (deflate 는 백엔드에서 압축하므로 엔진은 압축하지 않음)
+        if job.get("compression") is not None:
+            request["compression"] = "none" if job["compression"] == "deflate" else job["compression"]
+        # 사전 설정: 결과를 마지막 레벨로 mod switch 해서 크기를 줄임
+        if job.get("mod_switch"):
+            request["mod_switch"] = True
+        # 문서 점수를 슬롯별로 묶어 결과 암호문 하나에 slot_count 개씩 ("index_ids" = 슬롯 -> index_id)
+        if job.get("packed"):
+            request["packed"] = True
+        # 검색 한 건의 엔진 내부 연산 스레드 수 (없으면 엔진 기본값 1)
+        if job.get("threads"):
+            request["threads"] = job["threads"]
+        # job["index_ids"] 가 있으면 폴더 전체가 아니라 해당 인덱스 벡터만 연산 (standing query)
+        if job.get("index_ids") is not None:
+            request["index_ids"] = list(job["index_ids"])
+        await self._send(request)
+        self.last_keys_path = job["keys_path"]
+
+        while True:
+            line = await self.process.stdout.readline()
+            if not line:
+                raise EngineError("검색 엔진 프로세스가 종료되었습니다.")
+
+            decoded_line = line.decode().strip()
+            if not decoded_line:
+                continue
+
+            try:
+                message = json.loads(decoded_line)
+            except json.JSONDecodeError:
+                continue
+
+            if message.get("status") == "done":
+                self.in_flight = False
+                self.last_stats = message
+                if message.get("error"):
+                    raise EngineError(message["error"])
+                return
+
+            if "length" in message:
+                try:
+                    message["enc_score_bytes"] = await self.process.stdout.readexactly(message["length"])
+                except asyncio.IncompleteReadError:
+                    raise EngineError("검색 엔진 프로세스가 종료되었습니다.")
+
+            yield message
+
+
+class EnginePool:
+    """상주 엔진 프로세스 풀. 프로세스는 처음 사용할 때 띄운다."""
+
+    def __init__(self, size: int):
+        self.size = max(1, size)
+        self._workers = [EngineWorker(i) for i in range(self.size)]
+        self._idle = None
+        self._cond = None
+
+    def _ensure_state(self):
+        # asyncio 객체는 실행 중인 이벤트 루프 안에서 만들어야 함
+        if self._cond is None:
+            self._cond = asyncio.Condition()
+            self._idle = list(self._workers)
+
+    def _pick_idle(self, keys_path):
+        # 해당 사용자의 키를 이미 들고 있는 워커를 우선 사용
+        for worker in self._idle:
+            if keys_path is not None and worker.last_keys_path == keys_path:
+                self._idle.remove(worker)
+                return worker
+        return self._idle.pop()
+
+    @asynccontextmanager
+    async def acquire(self, keys_path: str = None):
+        self._ensure_state()
+        with SEARCH_STAGE_SECONDS.time(stage="engine_wait"):
+            async with self._cond:
+                await self._cond.wait_for(lambda: self._idle)
+                worker = self._pick_idle(keys_path)
+
+        try:
+            if not worker.alive:
+                with SEARCH_STAGE_SECONDS.time(stage="engine_spawn"):
+                    await worker.start()
+            await worker.flush_invalidations()
+            yield worker
+        finally:
+            # 결과를 끝까지 읽지 못한 워커는 프로토콜이 어긋나므로 재시작
+            if worker.in_flight:
+                await worker.stop()
+            async with self._cond:
+                self._idle.append(worker)
+                self._cond.notify()
+
+    def stats(self) -> dict:
+        idle = len(self._idle) if self._idle is not None else self.size
+        return {
+            "size": self.size,
+            "busy": self.size - idle,
+            "alive": sum(1 for worker in self._workers if worker.alive),
+        }
+
+    def invalidate_keys(self, keys_path: str):
+        """키가 다시 업로드되면 호출. 각 워커는 다음 요청 전에 캐시에서 해당 키를 버린다."""
+        for worker in self._workers:
+            if worker.alive:
+                worker.pending_invalidations.add(keys_path)
+
+    async def shutdown(self):
+        for worker in self._workers:
+            await worker.stop()
+
+
+engine_pool = EnginePool(ENGINE_POOL_SIZE)
@@ -0,0 +1,42 @@
+from sqlalchemy.orm import Session
+
+from models import Folder
+
+# ----------------
+# 폴더 조상 경로 (materialized path)
+# ----------------
+# Folder.path 는 루트부터 자기 자신까지의 폴더 id 를 "/3/8/15/" 형태로 저장한다.
+# 경로 하나로 모든 조상을 알 수 있으므로 breadcrumb 을 한 번의 IN 쿼리로 가져올 수 있다.
+
+
+def child_path(parent_path: str, folder_id: int) -> str:
+    return f"{parent_path or '/'}{folder_id}/"
+
+
+def path_ids(path: str) -> list:
+    return [int(part) for part in path.strip("/").split("/") if part]
+
+
+def resolve_folder_path(db: Session, folder: Folder) -> str:
+    """folder.path 를 반환. path 컬럼 추가 이전에 만든 폴더는 부모를 따라 올라가며 계산한 뒤 채워 넣는다."""
+    if folder.path:
+        return folder.path
+
+    chain = []
+    current = folder
+    while current is not None:
+        chain.append(current)
+        if current.path or current.parent_id is None:
+            break
+        current = db.query(Folder).filter(Folder.owner_id == folder.owner_id, Folder.id == current.parent_id).first()
+
+    # chain[-1] 이 경로를 이미 알고 있는 조상이면 그 경로에서 이어 붙임
+    path = chain[-1].path if chain[-1].path else None
+    for node in reversed(chain):
+        if node.path:
+            continue
+        path = child_path(path, node.id)
+        node.path = path
+
+    db.commit()
+    return folder.path
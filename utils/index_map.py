@@ -0,0 +1,69 @@
+from collections import OrderedDict
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from db import AsyncSessionLocal
+from models import IndexVector
+from settings import INDEX_MAP_CACHE_SIZE
+
+# ----------------
+# index_id -> doc_id 매핑 캐시
+# ----------------
+# 검색 결과 한 줄마다 DB 를 조회하지 않도록 (user_id, dict_version, index_generation) 단위로 매핑 전체를 한 번에 로드해 둔다.
+# index_generation 은 업로드/삭제 커밋과 함께 1 증가하므로 다른 워커 프로세스의 변경도 새 매핑으로 다시 로드된다.
+# 같은 프로세스의 업로드/삭제는 invalidate_index_map 으로도 비운다.
+# 매핑에 없는 index_id (tombstone 전이거나 아직 커밋되지 않은 업로드)는 한 번만 DB 를 확인하고 None 으로 기록해 둔다.
+
+_index_maps = OrderedDict()
+# 사용자별 무효화 횟수. 로드 도중 무효화가 일어나면 오래된 매핑을 캐시에 넣지 않기 위해 사용
+_generations = {}
+
+
+async def load_index_map(db: AsyncSession, user_id: int, dict_id: int, dict_version: int,
+                         index_generation: int = 0) -> dict:
+    key = (user_id, dict_version, index_generation)
+    mapping = _index_maps.get(key)
+    if mapping is not None:
+        _index_maps.move_to_end(key)
+        return mapping
+
+    generation = _generations.get(user_id, 0)
+    result = await db.execute(select(IndexVector.id, IndexVector.doc_id).filter(
+        IndexVector.owner_id == user_id,
+        IndexVector.dict_id == dict_id
+    ))
+    mapping = {row.id: row.doc_id for row in result}
+
+    if _generations.get(user_id, 0) == generation:
+        _index_maps[key] = mapping
+        while len(_index_maps) > INDEX_MAP_CACHE_SIZE:
+            _index_maps.popitem(last=False)
+
+    return mapping
+
+
+async def lookup_doc_id(mapping: dict, user_id: int, index_id: int):
+    if index_id in mapping:
+        return mapping[index_id]
+
+    # 매핑 로드 직후 커밋된 인덱스일 수 있으므로 한 번만 DB 확인. 없으면 None 을 기록해서 이후 결과/검색은 조회하지 않음
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(select(IndexVector.doc_id).filter(
+            IndexVector.owner_id == user_id,
+            IndexVector.id == index_id
+        ))
+        doc_id = result.scalar()
+    mapping[index_id] = doc_id
+    return doc_id
+
+
+def invalidate_index_map(user_id: int, dict_version: int = None):
+    _generations[user_id] = _generations.get(user_id, 0) + 1
+    for key in [key for key in _index_maps
+                if key[0] == user_id and (dict_version is None or key[1] == dict_version)]:
+        del _index_maps[key]
+
+
+def cache_size() -> int:
+    return len(_index_maps)
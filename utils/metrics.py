@@ -0,0 +1,183 @@
+import math
+import threading
+import time
+
+# ----------------
+# Prometheus 텍스트 포맷 메트릭
+# ----------------
+# 외부 라이브러리 없이 Counter / Histogram / 콜백 Gauge 만 구현한다. 값은 프로세스 로컬이므로
+# 워커 프로세스를 여러 개 띄우면 각 워커의 /metrics 를 따로 수집해야 한다.
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+BYTES_BUCKETS = tuple(1024 * 4 ** i for i in range(11))  # 1KB ~ 1GB
+COUNT_BUCKETS = (1, 10, 100, 1000, 10000, 100000, 1000000)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=None) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics)
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+class Counter:
+    type = "counter"
+
+    def __init__(self, name: str, help: str, labels=()):
+        self.name, self.help, self.label_names = name, help, tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+        REGISTRY.register(self)
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(labels.get(name, "") for name in self.label_names)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+        return [f"{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}"
+                for key, value in values.items()]
+
+
+class Histogram:
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, labels=(), buckets=LATENCY_BUCKETS):
+        self.name, self.help, self.label_names = name, help, tuple(labels)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        self._values = {}  # 라벨 -> [버킷별 개수, 합계, 개수]
+        self._lock = threading.Lock()
+        REGISTRY.register(self)
+
+    def observe(self, value: float, **labels):
+        key = tuple(labels.get(name, "") for name in self.label_names)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[0][i] += 1
+                    break
+            entry[1] += value
+            entry[2] += 1
+
+    def time(self, **labels):
+        return _Timer(self, labels)
+
+    def samples(self):
+        with self._lock:
+            values = {key: ([*entry[0]], entry[1], entry[2]) for key, entry in self._values.items()}
+
+        lines = []
+        for key, (counts, total, count) in values.items():
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.label_names, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.label_names, key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.label_names, key)} {count}")
+        return lines
+
+
+class _Timer:
+    """with HISTOGRAM.time(stage="..."): 블록 실행 시간을 초 단위로 기록"""
+
+    def __init__(self, histogram: Histogram, labels: dict):
+        self.histogram, self.labels = histogram, labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start, **self.labels)
+        return False
+
+
+class CallbackGauge:
+    """수집 시점에 fn() 을 호출해서 값을 채우는 gauge. fn 은 숫자 또는 {라벨 값 튜플: 숫자} 를 반환"""
+    type = "gauge"
+
+    def __init__(self, name: str, help: str, fn, labels=()):
+        self.name, self.help, self.fn, self.label_names = name, help, fn, tuple(labels)
+        REGISTRY.register(self)
+
+    def samples(self):
+        values = self.fn()
+        if not isinstance(values, dict):
+            values = {(): values}
+        return [f"{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}"
+                for key, value in values.items()]
+
+
+# ----------------
+# 공통 메트릭
+# ----------------
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "he_http_request_duration_seconds", "HTTP request latency by route template",
+    labels=("method", "route", "status"),
+)
+
+SEARCH_STAGE_SECONDS = Histogram(
+    "he_search_stage_seconds",
+    "Search time by stage (job_setup, index_map, engine_wait, engine_spawn, engine_compute, db_mapping, ws_send)",
+    labels=("stage",),
+)
+SEARCH_BYTES_SENT = Histogram(
+    "he_search_bytes_sent", "Result bytes sent to the client per search job", buckets=BYTES_BUCKETS,
+)
+SEARCH_VECTORS_SCANNED = Histogram(
+    "he_search_vectors_scanned", "Index vectors scanned by the engine per scan pass (one pass evaluates grouped queries)", buckets=COUNT_BUCKETS,
+)
+SEARCH_RESULT_RAW_BYTES = Histogram(
+    "he_search_result_raw_bytes", "Uncompressed result ciphertext bytes per search job",
+    labels=("compression",), buckets=BYTES_BUCKETS,
+)
+SEARCH_RESULT_PAYLOAD_BYTES = Histogram(
+    "he_search_result_payload_bytes", "Result ciphertext bytes after compression per search job",
+    labels=("compression",), buckets=BYTES_BUCKETS,
+)
+SEARCH_JOBS = Counter("he_search_jobs_total", "Search jobs by outcome", labels=("outcome",))
+SEARCH_RESULT_CACHE = Counter("he_search_result_cache_total", "Search result cache lookups", labels=("outcome",))
+
+UPLOAD_BYTES = Counter("he_upload_bytes_total", "Bytes received through streamed uploads")
+UPLOAD_SECONDS = Histogram("he_upload_duration_seconds", "Time to receive and store one uploaded file")
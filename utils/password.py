@@ -0,0 +1,101 @@
+import asyncio
+import base64
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from argon2.low_level import hash_secret_raw, Type
+from fastapi import HTTPException
+
+from settings import ARGON2_MAX_WORKERS, ARGON2_MAX_QUEUE
+
+
+def compute_pw_verifier(password: str, salt_b64: str, time_cost: int, memory_cost: int, parallelism: int) -> str:
+    # 프로세스 풀에서 실행되므로 모듈 최상위 함수여야 함 (pickle 가능)
+    salt = base64.b64decode(salt_b64)
+    return base64.b64encode(hash_secret_raw(
+        password.encode(),
+        salt,
+        time_cost,
+        memory_cost,
+        parallelism,
+        32,
+        Type.ID
+    )).decode()
+
+
+# ----------------
+# Argon2 전용 프로세스 풀
+# ----------------
+
+class Argon2Pool:
+    """Argon2 계산을 다른 라우트가 쓰는 스레드풀과 분리된 프로세스 풀에서 실행한다.
+
+    동시에 max_workers 개까지 계산하고, 대기열이 max_queue 를 넘으면 기다리지 않고 바로 503 을 반환한다.
+    """
+
+    def __init__(self, max_workers: int, max_queue: int):
+        self.max_workers = max(1, max_workers)
+        self.max_queue = max(0, max_queue)
+        self.in_flight = 0  # 계산 중 + 대기 중 (이벤트 루프에서만 변경)
+        self.completed = 0
+        self.failed = 0  # 프로세스 풀 오류 등으로 예외가 난 계산
+        self.rejected = 0
+        self.total_seconds = 0.0
+        self._executor = None
+
+    def _get_executor(self):
+        if self._executor is None:
+            # 이벤트 루프/스레드가 떠 있는 프로세스를 fork 하지 않도록 spawn 사용
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return self._executor
+
+    @property
+    def queue_depth(self):
+        return max(0, self.in_flight - self.max_workers)
+
+    async def compute_verifier(self, password: str, salt_b64: str, time_cost: int, memory_cost: int,
+                               parallelism: int) -> str:
+        if self.in_flight >= self.max_workers + self.max_queue:
+            self.rejected += 1
+            raise HTTPException(status_code=503, detail="요청이 많아 잠시 후 다시 시도해주세요.",
+                                headers={"Retry-After": "1"})
+
+        self.in_flight += 1
+        start = time.perf_counter()
+        try:
+            loop = asyncio.get_running_loop()
+            verifier = await loop.run_in_executor(
+                self._get_executor(), compute_pw_verifier,
+                password, salt_b64, time_cost, memory_cost, parallelism,
+            )
+        except BaseException:
+            self.failed += 1
+            raise
+        finally:
+            self.in_flight -= 1
+            self.total_seconds += time.perf_counter() - start
+
+        self.completed += 1
+        return verifier
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": self.in_flight,
+            "queue_depth": self.queue_depth,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "hash_seconds_total": self.total_seconds,
+        }
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+argon2_pool = Argon2Pool(ARGON2_MAX_WORKERS, ARGON2_MAX_QUEUE)
@@ -0,0 +1,76 @@
+import asyncio
+import os
+import time
+import uuid
+
+from settings import QUERY_SPOOL_DIR, QUERY_FILE_TTL_SECONDS, QUERY_GC_INTERVAL_SECONDS
+from utils.upload import remove_quietly
+
+UPLOAD_FOLDER = "uploads"
+
+# ----------------
+# 검색 쿼리 spool / 오래된 쿼리 파일 정리
+# ----------------
+# 웹소켓으로 바로 받은 쿼리 암호문은 QUERY_SPOOL_DIR (기본: /dev/shm) 에 잠깐 써서 엔진에 경로로 넘기고,
+# 검색 세션이 끝나면 지운다. 엔진 프로토콜(파일 경로)은 그대로 두고 디스크 쓰기만 없앤다.
+# /upload/queries 로 올린 쿼리 파일(uploads/query/user_{id}/)은 아무도 지우지 않으므로
+# 백그라운드 작업이 QUERY_FILE_TTL_SECONDS 보다 오래된 파일을 주기적으로 삭제한다.
+
+
+def write_spool_file(data: bytes) -> str:
+    os.makedirs(QUERY_SPOOL_DIR, exist_ok=True)
+    path = os.path.join(QUERY_SPOOL_DIR, f"{uuid.uuid4().hex}.eiv")
+    with open(path, "wb") as f:
+        f.write(data)
+    return path
+
+
+def remove_spool_files(paths):
+    for path in paths:
+        remove_quietly(path)
+
+
+def _remove_expired(folder: str, cutoff: float) -> int:
+    removed = 0
+    try:
+        entries = list(os.scandir(folder))
+    except OSError:
+        return 0
+
+    for entry in entries:
+        try:
+            if entry.is_file() and entry.stat().st_mtime < cutoff:
+                os.remove(entry.path)
+                removed += 1
+        except OSError:
+            pass  # 그 사이 지워졌거나 지울 수 없으면 패스
+    return removed
+
+
+def gc_query_files(now: float = None) -> int:
+    """TTL 이 지난 업로드 쿼리 파일과, 비정상 종료로 남은 spool 파일을 삭제하고 삭제한 개수를 반환"""
+    cutoff = (now if now is not None else time.time()) - QUERY_FILE_TTL_SECONDS
+    removed = 0
+
+    query_root = os.path.join(UPLOAD_FOLDER, "query")
+    try:
+        user_dirs = [entry.path for entry in os.scandir(query_root) if entry.is_dir()]
+    except OSError:
+        user_dirs = []
+    for user_dir in user_dirs:
+        removed += _remove_expired(user_dir, cutoff)
+
+    removed += _remove_expired(QUERY_SPOOL_DIR, cutoff)
+    return removed
+
+
+async def run_query_gc():
+    """서버 시작 시 띄우는 정리 루프 (QUERY_GC_INTERVAL_SECONDS 마다)"""
+    while True:
+        try:
+            removed = await asyncio.to_thread(gc_query_files)
+            if removed:
+                print(f"[QUERY GC] removed {removed} expired query files")
+        except Exception as e:
+            print(f"[QUERY GC] failed: {e}")
+        await asyncio.sleep(QUERY_GC_INTERVAL_SECONDS)
@@ -0,0 +1,107 @@
+import base64
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+from settings import RESULT_CACHE_BYTES
+
+# ----------------
+# 검색 결과 캐시
+# ----------------
+# 같은 쿼리(내용 hash)를 같은 사전 버전에 다시 검색하면 엔진을 돌리지 않고 이전 결과 암호문을 그대로 돌려준다.
+# 키: (user_id, 쿼리 sha256, dict_version, index_generation)
+# index_generation 은 Dictionary 행에 저장되며 파일 업로드/삭제 시 같은 트랜잭션에서 1 증가하므로,
+# 인덱스 집합이 바뀐 뒤에는 이전 키로 저장된 결과가 다시 쓰이지 않는다. (오래된 항목은 LRU 로 밀려남)
+
+
+class CachedResults:
+    """검색 작업 하나의 결과 [(file_id, score)]. score 는 format 이 "binary" 면 bytes, "json" 이면 base64 문자열
+
+    packed 결과면 file_id 는 슬롯 순서의 file_id 목록 (매핑되지 않은 슬롯은 None)
+    """
+
+    def __init__(self, fmt: str, items: list):
+        self.format = fmt
+        self.items = items
+        self.nbytes = sum(len(score) for _, score in items) + 64 * len(items)
+
+    def iter_items(self, fmt: str):
+        # 저장된 형식과 요청 형식이 다르면 여기서 한 번만 변환
+        for file_id, score in self.items:
+            if fmt == self.format:
+                yield file_id, score
+            elif fmt == "binary":
+                yield file_id, base64.b64decode(score)
+            else:
+                yield file_id, base64.b64encode(score).decode()
+
+
+class ResultCache:
+    """바이트 크기 기준 LRU. 검색 작업들이 이벤트 루프와 스레드에서 같이 쓰므로 락으로 보호한다."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def set(self, key, entry: CachedResults):
+        if entry.nbytes > self.max_bytes:
+            return
+
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None:
+                self.bytes -= old.nbytes
+            self._data[key] = entry
+            self.bytes += entry.nbytes
+            while self.bytes > self.max_bytes:
+                _, evicted = self._data.popitem(last=False)
+                self.bytes -= evicted.nbytes
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._data), "bytes": self.bytes, "hits": self.hits, "misses": self.misses}
+
+
+result_cache = ResultCache(RESULT_CACHE_BYTES)
+
+# 쿼리 파일 경로 -> ((mtime, size), sha256). 쿼리 파일은 uuid 이름으로 한 번 쓰고 바꾸지 않으므로 매번 다시 읽지 않음
+_digests = OrderedDict()
+_digests_lock = threading.Lock()
+_DIGEST_MEMO_SIZE = 4096
+
+
+def query_digest(query_path: str) -> str:
+    """쿼리 파일 내용의 sha256 (파일을 읽으므로 이벤트 루프에서는 스레드로 호출)"""
+    stat = os.stat(query_path)
+    signature = (stat.st_mtime_ns, stat.st_size)
+    with _digests_lock:
+        memo = _digests.get(query_path)
+    if memo is not None and memo[0] == signature:
+        return memo[1]
+
+    digest = hashlib.sha256()
+    with open(query_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+
+    # 파일 읽기는 잠금 밖에서, memo 갱신만 잠금 안에서 (여러 to_thread 워커가 동시에 호출)
+    with _digests_lock:
+        _digests[query_path] = (signature, digest.hexdigest())
+        while len(_digests) > _DIGEST_MEMO_SIZE:
+            _digests.popitem(last=False)
+    return digest.hexdigest()
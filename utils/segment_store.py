@@ -0,0 +1,229 @@
+import fcntl
+import os
+import re
+import shutil
+import struct
+from contextlib import contextmanager, ExitStack
+
+from settings import SEGMENT_MAX_BYTES, SEGMENT_COMPACT_RATIO
+from utils.upload import remove_quietly
+
+# ----------------
+# 인덱스 벡터 세그먼트 저장소
+# ----------------
+# 사용자/사전 버전별 인덱스 폴더(uploads/index/user_{id}/dict_{v}) 에 인덱스 벡터를 문서마다 파일로 두지 않고
+# append-only 세그먼트에 이어 붙인다. (엔진 쪽 C++/index_segments.h 와 같은 형식)
+#   segment_{N}.seg : 암호화 인덱스 벡터 바이트를 이어 붙인 파일
+#   segment_{N}.idx : RECORD 레코드 (index_id, offset, length). length == 0 은 삭제(tombstone)
+#   {index_id}.eiv  : 세그먼트 도입 이전의 개별 파일. 압축 시 세그먼트로 옮긴다.
+#   .lock           : 추가/압축은 배타 잠금, 엔진은 목록을 읽는 동안만 공유 잠금
+# 같은 index_id 에 대해서는 legacy 파일 -> 세그먼트 번호 오름차순 -> 파일 내 순서로 마지막 레코드가 유효하다.
+# tombstone 은 항상 가장 최신 세그먼트에 쓰므로 지우려는 레코드보다 뒤에 적용된다.
+
+RECORD = struct.Struct("<qQQ")
+LOCK_NAME = ".lock"
+SEGMENT_RE = re.compile(r"^segment_(\d+)\.idx$")
+LEGACY_RE = re.compile(r"^(\d+)\.eiv$")
+
+
+@contextmanager
+def folder_lock(folder: str):
+    # 여러 워커 프로세스가 같은 폴더에 동시에 쓰지 않도록 flock 사용
+    fd = os.open(os.path.join(folder, LOCK_NAME), os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        yield
+    finally:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+        os.close(fd)
+
+
+@contextmanager
+def lock_folders(folders):
+    # 여러 폴더를 정렬된 순서로 잠금 (동시에 실행되는 삭제끼리 교착되지 않도록). 없는 폴더는 건너뜀
+    with ExitStack() as stack:
+        for folder in sorted(set(folders)):
+            if os.path.isdir(folder):
+                stack.enter_context(folder_lock(folder))
+        yield
+
+
+def segment_paths(folder: str, number: int):
+    base = os.path.join(folder, f"segment_{number}")
+    return f"{base}.seg", f"{base}.idx"
+
+
+def list_segments(folder: str) -> list:
+    numbers = []
+    for name in os.listdir(folder):
+        match = SEGMENT_RE.match(name)
+        if match:
+            numbers.append(int(match.group(1)))
+    return sorted(numbers)
+
+
+def read_records(idx_path: str) -> list:
+    with open(idx_path, "rb") as f:
+        data = f.read()
+    # 기록 도중 끊긴 마지막 불완전 레코드는 무시
+    usable = len(data) - len(data) % RECORD.size
+    return list(RECORD.iter_unpack(data[:usable]))
+
+
+def _active_segment(folder: str) -> int:
+    numbers = list_segments(folder)
+    if not numbers:
+        return 0
+
+    number = numbers[-1]
+    seg_path, _ = segment_paths(folder, number)
+    if os.path.exists(seg_path) and os.path.getsize(seg_path) >= SEGMENT_MAX_BYTES:
+        return number + 1
+    return number
+
+
+def _append_records(idx_path: str, records):
+    with open(idx_path, "ab") as f:
+        # 이전에 끊긴 불완전 레코드가 있으면 잘라내고 이어 씀 (레코드 경계 유지)
+        size = f.seek(0, os.SEEK_END)
+        if size % RECORD.size:
+            f.truncate(size - size % RECORD.size)
+        f.write(b"".join(RECORD.pack(*record) for record in records))
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def append_vectors(folder: str, items):
+    """items: [(index_id, 파일 경로)]. 파일 내용을 활성 세그먼트 끝에 이어 붙이고 오프셋 테이블에 기록한다.
+
+    데이터를 먼저 쓰고 레코드를 나중에 쓰므로, 엔진이 읽는 레코드는 항상 데이터가 있는 상태다.
+    """
+    if not items:
+        return
+
+    with folder_lock(folder):
+        seg_path, idx_path = segment_paths(folder, _active_segment(folder))
+
+        records = []
+        with open(seg_path, "ab") as seg:
+            offset = seg.seek(0, os.SEEK_END)
+            for index_id, src_path in items:
+                with open(src_path, "rb") as src:
+                    shutil.copyfileobj(src, seg)
+                length = seg.tell() - offset
+                records.append((index_id, offset, length))
+                offset += length
+            seg.flush()
+            os.fsync(seg.fileno())
+
+        _append_records(idx_path, records)
+
+
+def write_tombstones(folder: str, index_ids, locked: bool = False):
+    """locked=True 면 호출하는 쪽이 이미 lock_folders 로 폴더를 잠근 상태 (flock 은 같은 프로세스라도 다시 잡으면 막힘)"""
+    index_ids = list(index_ids)
+    if not index_ids or not os.path.isdir(folder):
+        return
+
+    with ExitStack() as stack:
+        if not locked:
+            stack.enter_context(folder_lock(folder))
+        # legacy .eiv 만 있는 폴더여도 기록해 둠 (압축이 먼저 .eiv 를 세그먼트로 옮겨도 삭제가 유지되도록)
+        numbers = list_segments(folder)
+        _, idx_path = segment_paths(folder, numbers[-1] if numbers else 0)
+        _append_records(idx_path, [(index_id, 0, 0) for index_id in index_ids])
+
+
+def _live_entries(folder: str):
+    """살아있는 index_id -> (경로, offset, length), 세그먼트 전체 바이트 수, legacy 파일 목록을 반환
+
+    legacy .eiv 는 length=None
+    """
+    live = {}
+    legacy_paths = []
+    for name in os.listdir(folder):
+        match = LEGACY_RE.match(name)
+        if match:
+            path = os.path.join(folder, name)
+            legacy_paths.append(path)
+            live[int(match.group(1))] = (path, 0, None)
+
+    total_bytes = 0
+    for number in list_segments(folder):
+        seg_path, idx_path = segment_paths(folder, number)
+        if os.path.exists(seg_path):
+            total_bytes += os.path.getsize(seg_path)
+        for index_id, offset, length in read_records(idx_path):
+            if length == 0:
+                live.pop(index_id, None)
+            else:
+                live[index_id] = (seg_path, offset, length)
+    return live, total_bytes, legacy_paths
+
+
+def _needs_compaction(folder: str) -> bool:
+    live, total_bytes, legacy_paths = _live_entries(folder)
+    if legacy_paths:
+        return True  # legacy .eiv 이관
+
+    live_bytes = sum(length for _, _, length in live.values())
+    return total_bytes > 0 and (total_bytes - live_bytes) / total_bytes >= SEGMENT_COMPACT_RATIO
+
+
+def compact(folder: str, force: bool = False) -> bool:
+    """삭제된 레코드를 걷어내고 살아있는 벡터(+ legacy .eiv)를 새 세그먼트 하나로 다시 쓴다.
+
+    엔진은 목록을 읽을 때 잠금 안에서 세그먼트를 미리 열어두므로, 옛 세그먼트를 지워도 진행 중인 검색은 끝까지 읽는다.
+    """
+    if not os.path.isdir(folder):
+        return False
+
+    with folder_lock(folder):
+        if not force and not _needs_compaction(folder):
+            return False
+
+        live, _, legacy_paths = _live_entries(folder)
+        old_numbers = list_segments(folder)
+        new_number = (old_numbers[-1] + 1) if old_numbers else 0
+        seg_path, idx_path = segment_paths(folder, new_number)
+        tmp_seg, tmp_idx = f"{seg_path}.part", f"{idx_path}.part"
+
+        try:
+            records = []
+            with open(tmp_seg, "wb") as seg:
+                # 세그먼트 순서대로 읽어서 쓰도록 (경로, offset) 정렬
+                for index_id, (path, offset, length) in sorted(live.items(), key=lambda item: item[1][:2]):
+                    start = seg.tell()
+                    with open(path, "rb") as src:
+                        if length is None:
+                            shutil.copyfileobj(src, seg)
+                        else:
+                            src.seek(offset)
+                            seg.write(src.read(length))
+                    records.append((index_id, start, seg.tell() - start))
+                seg.flush()
+                os.fsync(seg.fileno())
+
+            with open(tmp_idx, "wb") as f:
+                f.write(b"".join(RECORD.pack(*record) for record in records))
+                f.flush()
+                os.fsync(f.fileno())
+
+            # .seg 를 먼저, .idx 를 마지막에 rename (idx 가 보이는 순간부터 새 세그먼트가 유효)
+            os.replace(tmp_seg, seg_path)
+            os.replace(tmp_idx, idx_path)
+        except BaseException:
+            remove_quietly(tmp_seg)
+            remove_quietly(tmp_idx)
+            raise
+
+        for number in old_numbers:
+            old_seg, old_idx = segment_paths(folder, number)
+            remove_quietly(old_idx)
+            remove_quietly(old_seg)
+        # 살아있는 legacy 파일은 새 세그먼트로 옮겨졌고, tombstone 된 파일은 tombstone 과 함께 사라져야 함
+        for path in legacy_paths:
+            remove_quietly(path)
+
+    print(f"[SEGMENT] compacted {folder}: {len(live)} vectors -> segment_{new_number}")
+    return True
@@ -0,0 +1,154 @@
+import asyncio
+import os
+
+from sqlalchemy import select
+
+from db import AsyncSessionLocal
+from models import StandingQuery, StandingResult, Dictionary, File
+from utils.engine_pool import engine_pool
+from settings import SEARCH_SEND_QUEUE_SIZE
+
+UPLOAD_FOLDER = "uploads"
+
+# ----------------
+# Standing query
+# ----------------
+# 등록된 쿼리를 새로 업로드된 문서의 인덱스 벡터에 대해서만 평가한다. (폴더 전체를 다시 검색하지 않음)
+# 결과는 해당 사용자의 standing 웹소켓이 연결되어 있으면 바로 보내고, 없으면 수신함(StandingResult)에 저장한다.
+
+
+class StandingHub:
+    """사용자별로 연결된 standing 웹소켓의 전송 큐. 프로세스 로컬이므로 다른 워커의 연결에는 수신함으로 전달된다."""
+
+    def __init__(self):
+        self._queues = {}  # user_id -> {asyncio.Queue}
+
+    def subscribe(self, user_id: int) -> asyncio.Queue:
+        queue = asyncio.Queue(maxsize=SEARCH_SEND_QUEUE_SIZE)
+        self._queues.setdefault(user_id, set()).add(queue)
+        return queue
+
+    def unsubscribe(self, user_id: int, queue: asyncio.Queue):
+        queues = self._queues.get(user_id)
+        if queues is None:
+            return
+        queues.discard(queue)
+        if not queues:
+            del self._queues[user_id]
+
+    def publish(self, user_id: int, message: dict) -> bool:
+        """연결된 웹소켓 중 하나라도 받았으면 True. 큐가 가득 찬 연결은 건너뜀 (결과는 수신함으로)"""
+        delivered = False
+        for queue in list(self._queues.get(user_id, ())):
+            try:
+                queue.put_nowait(message)
+                delivered = True
+            except asyncio.QueueFull:
+                pass
+        return delivered
+
+    def connection_count(self) -> int:
+        return sum(len(queues) for queues in self._queues.values())
+
+
+standing_hub = StandingHub()
+
+
+async def store_results(user_id: int, messages):
+    """웹소켓으로 보내지 못한 결과를 수신함에 저장
+
+    결과가 큐에 있거나 평가 중인 사이에 standing query / 파일이 삭제될 수 있으므로, 아직 남아 있는 것만 저장한다.
+    확인과 저장 사이에 삭제되어 FK 오류가 나면 한 번 더 걸러서 다시 시도하고, 그래도 실패하면 로그만 남긴다.
+    """
+    messages = list(messages)
+    if not messages:
+        return
+
+    for attempt in range(2):
+        try:
+            async with AsyncSessionLocal() as db:
+                query_ids = set((await db.execute(select(StandingQuery.id).filter(
+                    StandingQuery.owner_id == user_id,
+                    StandingQuery.id.in_({message["standing_query_id"] for message in messages}),
+                ))).scalars())
+                file_ids = set((await db.execute(select(File.id).filter(
+                    File.owner_id == user_id,
+                    File.id.in_({message["file_id"] for message in messages}),
+                ))).scalars())
+
+                records = [StandingResult(
+                    owner_id=user_id,
+                    standing_query_id=message["standing_query_id"],
+                    file_id=message["file_id"],
+                    enc_score=message["score"],
+                ) for message in messages
+                    if message["standing_query_id"] in query_ids and message["file_id"] in file_ids]
+                if len(records) < len(messages):
+                    print(f"[STANDING] user {user_id}: {len(messages) - len(records)} results dropped "
+                          f"(standing query or file deleted)")
+                if not records:
+                    return
+
+                db.add_all(records)
+                await db.commit()
+                return
+        except Exception as e:
+            print(f"[STANDING] user {user_id}: inbox 저장 실패 (attempt {attempt + 1}): {e}")
+
+
+async def evaluate_standing_queries(user_id: int, new_vectors):
+    """upload_file 커밋 후 (BackgroundTasks) 실행.
+
+    new_vectors: [(dict_id, vector_folder, index_id, doc_id)] - 이번 업로드로 추가된 인덱스 벡터
+    """
+    by_dict = {}
+    for dict_id, vector_folder, index_id, doc_id in new_vectors:
+        by_dict.setdefault(dict_id, (vector_folder, {}))[1][index_id] = doc_id
+
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            select(StandingQuery, Dictionary.poly_degree, Dictionary.mod_switch)
+            .join(Dictionary, StandingQuery.dict_id == Dictionary.id)
+            .filter(StandingQuery.owner_id == user_id, StandingQuery.dict_id.in_(by_dict.keys()))
+        )
+        rows = result.all()
+
+    if not rows:
+        return
+
+    keys_path = os.path.join(UPLOAD_FOLDER, "keys", f"user_{user_id}")
+    undelivered = []
+
+    for query, poly_degree, mod_switch in rows:
+        vector_folder, doc_ids = by_dict[query.dict_id]
+        job = {
+            "query_path": query.query_path,
+            "vector_folder": vector_folder,
+            "poly_degree": poly_degree,
+            "keys_path": keys_path,
+            "mod_switch": mod_switch,
+            # 새 인덱스 벡터만 연산
+            "index_ids": list(doc_ids),
+        }
+
+        try:
+            async with engine_pool.acquire(keys_path) as worker:
+                async for cpp_result in worker.search(job):
+                    doc_id = doc_ids.get(cpp_result.get("index_id"))
+                    if doc_id is None or cpp_result.get("enc_score") is None:
+                        continue
+
+                    message = {
+                        "standing_query_id": query.id,
+                        "dict_version": query.dict_version,
+                        "file_id": doc_id,
+                        "score": cpp_result["enc_score"],
+                    }
+                    if not standing_hub.publish(user_id, message):
+                        undelivered.append(message)
+        except Exception as e:
+            print(f"[STANDING] query {query.id} 평가 실패: {e}")
+
+    await store_results(user_id, undelivered)
+    print(f"[STANDING] user {user_id}: {len(rows)} queries x {len(new_vectors)} new vectors, "
+          f"{len(undelivered)} results -> inbox")
@@ -0,0 +1,58 @@
+import os
+import time
+import uuid
+
+import aiofiles
+from fastapi import HTTPException, UploadFile
+
+from settings import UPLOAD_CHUNK_SIZE
+from utils.metrics import UPLOAD_BYTES, UPLOAD_SECONDS
+
+
+# ----------------
+# 업로드 파일 저장 (청크 단위 스트리밍)
+# ----------------
+
+def temp_path_for(dest_path: str) -> str:
+    # 같은 디렉토리에 만들어야 os.replace 가 원자적으로 동작함
+    return f"{dest_path}.{uuid.uuid4().hex}.part"
+
+
+def remove_quietly(path: str):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+async def save_upload_file(upload: UploadFile, dest_path: str, max_bytes: int) -> int:
+    """업로드 파일을 UPLOAD_CHUNK_SIZE 단위로 임시 파일에 쓰고, 끝까지 쓴 경우에만 dest_path 로 rename 한다.
+
+    max_bytes 를 넘으면 413 을 던지며, 실패 시 임시 파일은 남기지 않는다. 저장한 바이트 수를 반환한다.
+    """
+    tmp_path = temp_path_for(dest_path)
+    written = 0
+    start = time.perf_counter()
+
+    try:
+        async with aiofiles.open(tmp_path, mode="wb") as f:
+            while True:
+                chunk = await upload.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+
+                written += len(chunk)
+                if written > max_bytes:
+                    raise HTTPException(status_code=413, detail=f"업로드 파일이 허용 크기({max_bytes} Bytes)를 초과했습니다.")
+
+                await f.write(chunk)
+
+        os.replace(tmp_path, dest_path)
+    except BaseException:
+        remove_quietly(tmp_path)
+        raise
+
+    # 처리량 = rate(he_upload_bytes_total) / 업로드 시간
+    UPLOAD_BYTES.inc(written)
+    UPLOAD_SECONDS.observe(time.perf_counter() - start)
+    return written